@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Memory Benchmark for AI Prompt Vault
+====================================
+Compares the memory held by a loaded vault using plain dict records
+against the compact Prompt records (PROMPT_VAULT_COMPACT=1).
+
+Usage:
+    python bench_prompt_vault.py [--count N]
+
+Author: Randell Logan Smith (DonkRonk17)
+License: MIT
+"""
+
+import argparse
+import gc
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import prompt_vault
+
+
+def build_vault(count, seed=42):
+    """Build a synthetic vault with realistic category/tag repetition."""
+    rng = random.Random(seed)
+    tags = ["python", "review", "testing", "docs", "api", "security", "react", "sql"]
+    start = datetime(2024, 1, 1)
+    prompts = []
+    for i in range(count):
+        created = start + timedelta(seconds=rng.randrange(60 * 86400), microseconds=rng.randrange(10**6))
+        content = f"Prompt {i}: help me with [TASK] in [LANGUAGE]."
+        prompts.append({
+            "id": f"{i:08x}",
+            "name": f"prompt-{i}",
+            "content": content,
+            "category": rng.choice(prompt_vault.DEFAULT_CATEGORIES),
+            "tags": rng.sample(tags, 3),
+            "description": "",
+            "created": created.isoformat(),
+            "updated": created.isoformat(),
+            "uses": rng.randrange(1000),
+            "size": prompt_vault.prompt_size(content),
+        })
+    return {"prompts": prompts, "version": "1.0.0"}
+
+
+def measure(compact):
+    """Load the vault and return (retained bytes, peak bytes, seconds)."""
+    prompt_vault.COMPACT_RECORDS = compact
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    vault = prompt_vault.load_vault()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(vault["prompts"]) > 0
+    del vault
+    return retained, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dict vs compact record memory use")
+    parser.add_argument("--count", type=int, default=100_000, help="Number of prompts")
+    args = parser.parse_args()
+
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        prompt_vault.VAULT_DIR = temp_dir
+        prompt_vault.VAULT_FILE = temp_dir / "prompts.json"
+        prompt_vault.CONFIG_FILE = temp_dir / "config.json"
+        prompt_vault.VAULT_FILE.write_text(json.dumps(build_vault(args.count)))
+
+        print(f"\nLoading {args.count:,} prompts")
+        print(f"{'Records':<10} {'Retained':>12} {'Peak':>12} {'Per prompt':>12} {'Load':>8}")
+        print("─" * 58)
+        results = {}
+        for label, compact in (("dict", False), ("compact", True)):
+            retained, peak, elapsed = measure(compact)
+            results[label] = retained
+            print(f"{label:<10} {retained / 2**20:>10.1f}MB {peak / 2**20:>10.1f}MB "
+                  f"{retained / args.count:>11.0f}B {elapsed:>7.2f}s")
+        print(f"\nCompact records hold {1 - results['compact'] / results['dict']:.0%} less memory")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,26 @@ License: MIT
 Repository: https://github.com/DonkRonk17/ai-prompt-vault
 """
 
+import time
+_IMPORT_START = time.perf_counter()
+
+import bisect
 import json
+import mmap
 import os
+import shlex
 import sys
+import threading
 import argparse
-from datetime import datetime
+import array
+import base64
+import difflib
+import struct
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager, redirect_stdout
+from io import StringIO
+from datetime import datetime, timedelta
 from pathlib import Path
 import hashlib
 
@@ -42,6 +57,377 @@ DEFAULT_CATEGORIES = [
     "general"
 ]
 
+# Revision history: one append-only file per prompt id under VAULT_DIR/history.
+# Every SNAPSHOT_INTERVAL-th revision is stored in full, the rest as deltas
+# against their predecessor, so rebuilding a revision never replays more than
+# SNAPSHOT_INTERVAL - 1 deltas.
+HISTORY_DIRNAME = "history"
+SNAPSHOT_INTERVAL = 20
+
+# Usage analytics: fixed-size binary records in VAULT_DIR/usage.bin so that
+# recording a use rewrites one record in place instead of the whole vault.
+# Each record holds the lifetime count, a decayed "hotness" score and a ring
+# of USAGE_WINDOW_DAYS daily counters.
+USAGE_FILENAME = "usage.bin"
+USAGE_WINDOW_DAYS = 90
+HOT_HALF_LIFE_DAYS = 7.0
+_USAGE_HEADER = struct.Struct("<8sIdd")  # id key, total uses, last use (epoch s), hotness
+_USAGE_RECORD_SIZE = _USAGE_HEADER.size + 2 * USAGE_WINDOW_DAYS
+_usage_slots = {}
+
+# Cold tier: prompts unused for a long time move into an append-only segment
+# of zlib-compressed records (ARCHIVE_SEGMENT) with a small JSON index, so
+# load_vault and search no longer pay for them.
+ARCHIVE_SEGMENT = "archive.seg"
+ARCHIVE_INDEX = "archive.idx"
+ARCHIVE_COMPACT_MIN_BYTES = 64 * 1024
+
+# Prompt packs: read-only prompt sets compiled into the snapshot format under
+# VAULT_DIR/packs and layered beneath the user vault. Editing a pack prompt
+# copies it into the vault (copy-on-write); the pack itself never changes.
+PACKS_DIRNAME = "packs"
+_open_packs = {}
+
+# Size metadata: every record carries {"chars", "words", "tokens", "estimator"}
+# computed at write time, so agents can pick prompts that fit a context
+# budget without reading their bodies. Token counts come from a pluggable
+# offline estimator (see register_token_estimator).
+TOKEN_ESTIMATOR = "heuristic"
+
+# Directory import: file types picked up by `import-dir`, and the file count
+# below which parsing stays in-process (a pool costs more than it saves).
+IMPORT_EXTENSIONS = (".md", ".markdown", ".txt")
+PARALLEL_IMPORT_THRESHOLD = 64
+
+# Shell completion reads this sorted name list (one per line) through the
+# standalone prompt_vault_complete helper, without importing this module.
+NAMES_FILENAME = "names.txt"
+COMPLETION_HELPER = Path(__file__).with_name("prompt_vault_complete.py")
+NAME_COMMANDS = ["use", "get", "delete", "update", "history", "diff", "revert"]
+
+# Read-only snapshot rebuilt on every write, for processes that want to
+# mmap the vault and query it in place instead of each parsing prompts.json.
+SNAPSHOT_FILENAME = "prompts.snap"
+SNAPSHOT_MAGIC = b"PVSNAP1\0"
+_SNAP_HEADER = struct.Struct("<8sQIQQQQ")  # magic, generation, count, then section offsets
+_SNAP_RECORD = struct.Struct("<QIQIQI")    # name, metadata JSON, content (offset, length)
+_SNAP_INDEX = struct.Struct("<QII")        # key (offset, length), record number
+
+# Change journal: one line per vault write listing the ids it upserted or
+# deleted, so watchers can patch their in-memory copy instead of reloading.
+# Restarted once it grows past JOURNAL_MAX_BYTES (watchers then reload fully).
+JOURNAL_FILENAME = "changes.jsonl"
+JOURNAL_MAX_BYTES = 1 << 20
+_pending_changes = {"upserted": set(), "deleted": set()}
+
+# Compact records: with PROMPT_VAULT_COMPACT=1, load_vault holds prompts as
+# slotted Prompt objects (interned categories/tags, integer timestamps and
+# array-backed numeric columns) instead of dicts, for very large vaults.
+COMPACT_ENV_VAR = "PROMPT_VAULT_COMPACT"
+COMPACT_RECORDS = os.environ.get(COMPACT_ENV_VAR, "") not in ("", "0")
+_EPOCH = datetime(1970, 1, 1)
+
+# Query cache: list/search results persisted beside the vault as an LRU
+# bounded by entry count and bytes, valid only while the vault generation
+# (vault writes, uses and archive changes) is unchanged. Hit/miss counters
+# live in a small fixed-size side file so a cache hit never rewrites the
+# entries.
+QUERY_CACHE_FILENAME = "query_cache.json"
+QUERY_CACHE_STATS_FILENAME = "query_cache.stats"
+_QUERY_CACHE_STATS = struct.Struct("<QQ")  # hits, misses
+QUERY_CACHE_ENV_VAR = "PROMPT_VAULT_QUERY_CACHE"
+QUERY_CACHE_ENABLED = os.environ.get(QUERY_CACHE_ENV_VAR, "1") not in ("", "0")
+QUERY_CACHE_MAX_ENTRIES = 64
+QUERY_CACHE_MAX_BYTES = 1 << 20
+_query_cache = None
+
+# While a vault session is open (see vault_session), load_vault returns the
+# in-memory vault and save_vault only marks it dirty until the next commit.
+_session = None
+
+# Tracing: set PROMPT_VAULT_TRACE=1 (stderr) or =/path/to/trace.jsonl, or pass
+# --profile, to get per-phase timings and I/O counters for a CLI invocation.
+# An empty value or 0 leaves tracing off.
+TRACE_ENV_VAR = "PROMPT_VAULT_TRACE"
+_trace_hooks = []
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TRACING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def add_trace_hook(hook):
+    """Register a callable hook(kind, name, value) for trace events.
+
+    kind is "phase" (value = seconds spent in a named phase) or "count"
+    (value = increment of a named counter such as bytes_read).
+    """
+    _trace_hooks.append(hook)
+    return hook
+
+
+def remove_trace_hook(hook):
+    """Unregister a trace hook."""
+    if hook in _trace_hooks:
+        _trace_hooks.remove(hook)
+
+
+@contextmanager
+def trace_phase(name):
+    """Time a block and report it to the trace hooks."""
+    if not _trace_hooks:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for hook in list(_trace_hooks):
+            hook("phase", name, elapsed)
+
+
+def trace_count(name, value=1):
+    """Report a counter increment to the trace hooks."""
+    for hook in list(_trace_hooks):
+        hook("count", name, value)
+
+
+class TraceCollector:
+    """Trace hook that accumulates phase timings and counters."""
+    
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+    
+    def __call__(self, kind, name, value):
+        target = self.phases if kind == "phase" else self.counters
+        target[name] = target.get(name, 0) + value
+    
+    def as_dict(self):
+        """Return the collected metrics as a JSON-serializable dict."""
+        return {
+            "phases": {k: round(v, 6) for k, v in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+
+def trace_destination(profile=False):
+    """Where a CLI invocation's trace goes: "stderr", a file path, or None (off)."""
+    if profile:
+        return "stderr"
+    dest = os.environ.get(TRACE_ENV_VAR, "")
+    return dest if dest not in ("", "0") else None
+
+
+def write_trace(record, destination):
+    """Write a trace record as one JSON line to stderr or append it to a file."""
+    line = json.dumps(record)
+    if destination in ("", "1", "stderr"):
+        print(line, file=sys.stderr)
+    else:
+        with open(destination, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# COMPACT RECORDS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _to_micros(value):
+    """ISO timestamp -> integer microseconds, or None if it would not round-trip."""
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is not None or dt.isoformat() != value:
+        return None
+    return (dt - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value):
+    """Integer microseconds -> ISO timestamp."""
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+class PromptColumns:
+    """Array-backed numeric columns shared by the Prompt records of one vault."""
+    
+    NONE = -(1 << 63)  # marks a timestamp kept as a string instead
+    
+    def __init__(self):
+        self.uses = array.array("q")
+        self.created = array.array("q")
+        self.updated = array.array("q")
+        # Size metadata; -1 when the record has none
+        self.chars = array.array("q")
+        self.words = array.array("q")
+        self.tokens = array.array("q")
+
+
+class Prompt:
+    """Memory-compact prompt record with the same mapping interface as a dict.
+    
+    Category and tags are interned, tags are stored as a tuple, and uses,
+    timestamps and size counts live in the shared PromptColumns arrays. Keys
+    outside the standard record go into a small per-record dict.
+    """
+    
+    __slots__ = ("id", "name", "content", "category", "tags", "description",
+                 "estimator", "_columns", "_row", "_extra")
+    
+    FIELDS = ("id", "name", "content", "category", "tags", "description",
+              "created", "updated", "uses")
+    _SIZE_KEYS = ("chars", "words", "tokens", "estimator")
+    
+    @classmethod
+    def from_dict(cls, data, columns):
+        """Build a Prompt from a prompt dict (the only way records are created)."""
+        prompt = cls.__new__(cls)
+        prompt._columns = columns
+        prompt._row = row = len(columns.uses)
+        prompt._extra = None
+        prompt.id = data.get("id", "")
+        prompt.name = data.get("name", "")
+        prompt.content = data.get("content", "")
+        prompt.category = sys.intern(data.get("category", "general"))
+        prompt.tags = tuple(sys.intern(t) for t in data.get("tags") or ())
+        prompt.description = data.get("description", "")
+        columns.uses.append(data.get("uses", 0))
+        for key in ("created", "updated"):
+            # Missing timestamps stay missing: NONE with no _extra entry
+            micros = _to_micros(data[key]) if key in data else PromptColumns.NONE
+            if micros is None:
+                prompt._extra = prompt._extra or {}
+                prompt._extra[key] = data[key]
+                micros = PromptColumns.NONE
+            getattr(columns, key).append(micros)
+        size = data.get("size")
+        if Prompt._packable_size(size):
+            prompt.estimator = sys.intern(size["estimator"])
+            columns.chars.append(size["chars"])
+            columns.words.append(size["words"])
+            columns.tokens.append(size["tokens"])
+        else:
+            prompt.estimator = None
+            for column in (columns.chars, columns.words, columns.tokens):
+                column.append(-1)
+        for key, value in data.items():
+            if key not in Prompt.FIELDS and (key != "size" or prompt.estimator is None):
+                prompt._extra = prompt._extra or {}
+                prompt._extra[key] = value
+        return prompt
+    
+    @staticmethod
+    def _packable_size(size):
+        """True if a size dict has exactly the standard shape and can go in the columns."""
+        return (isinstance(size, dict) and tuple(size) == Prompt._SIZE_KEYS
+                and isinstance(size["estimator"], str)
+                and all(type(size[k]) is int and size[k] >= 0 for k in Prompt._SIZE_KEYS[:3]))
+    
+    def __getitem__(self, key):
+        if key == "tags":
+            return list(self.tags)
+        if key in ("created", "updated"):
+            value = getattr(self._columns, key)[self._row]
+            if value != PromptColumns.NONE:
+                return _from_micros(value)
+            if self._extra and key in self._extra:
+                return self._extra[key]
+            raise KeyError(key)
+        if key == "uses":
+            return self._columns.uses[self._row]
+        if key == "size" and self.estimator is not None:
+            columns, row = self._columns, self._row
+            return {"chars": columns.chars[row], "words": columns.words[row],
+                    "tokens": columns.tokens[row], "estimator": self.estimator}
+        if key in Prompt.__slots__[:6]:
+            return getattr(self, key)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        if key == "category":
+            self.category = sys.intern(value)
+        elif key == "tags":
+            self.tags = tuple(sys.intern(t) for t in value or ())
+        elif key in ("created", "updated"):
+            micros = _to_micros(value)
+            if micros is None:
+                self._extra = self._extra or {}
+                self._extra[key] = value
+                micros = PromptColumns.NONE
+            getattr(self._columns, key)[self._row] = micros
+        elif key == "uses":
+            self._columns.uses[self._row] = value
+        elif key == "size":
+            columns, row = self._columns, self._row
+            if Prompt._packable_size(value):
+                self.estimator = sys.intern(value["estimator"])
+                columns.chars[row], columns.words[row], columns.tokens[row] = \
+                    value["chars"], value["words"], value["tokens"]
+                if self._extra:
+                    self._extra.pop("size", None)
+            else:
+                self.estimator = None
+                columns.chars[row] = columns.words[row] = columns.tokens[row] = -1
+                self._extra = self._extra or {}
+                self._extra["size"] = value
+        elif key in Prompt.__slots__[:6]:
+            setattr(self, key, value)
+        else:
+            self._extra = self._extra or {}
+            self._extra[key] = value
+    
+    def _has_timestamp(self, key):
+        return (getattr(self._columns, key)[self._row] != PromptColumns.NONE
+                or bool(self._extra and key in self._extra))
+    
+    def __contains__(self, key):
+        if key in ("created", "updated"):
+            return self._has_timestamp(key)
+        return (key in Prompt.FIELDS or (key == "size" and self.estimator is not None)
+                or bool(self._extra and key in self._extra))
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __len__(self):
+        return len(self.keys())
+    
+    def keys(self):
+        fields = [k for k in Prompt.FIELDS if k not in ("created", "updated") or self._has_timestamp(k)]
+        extra = [k for k in (self._extra or ()) if k not in Prompt.FIELDS]
+        return fields + (["size"] if self.estimator is not None else []) + extra
+    
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def update(self, other):
+        for key, value in other.items():
+            self[key] = value
+    
+    def to_dict(self):
+        """Plain dict copy of the record."""
+        return dict(self.items())
+    
+    def __repr__(self):
+        return f"Prompt({self.to_dict()!r})"
+
+
+def _json_default(obj):
+    """json.dumps fallback that serializes Prompt records."""
+    if isinstance(obj, Prompt):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # VAULT OPERATIONS
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -54,171 +440,1751 @@ def init_vault():
         VAULT_FILE.write_text(json.dumps({"prompts": [], "version": "1.0.0"}, indent=2))
         print(f"✓ Created vault at {VAULT_FILE}")
     
-    if not CONFIG_FILE.exists():
-        config = {
-            "categories": DEFAULT_CATEGORIES,
-            "default_category": "general",
-            "created": datetime.now().isoformat()
-        }
-        CONFIG_FILE.write_text(json.dumps(config, indent=2))
-        print(f"✓ Created config at {CONFIG_FILE}")
+    if not CONFIG_FILE.exists():
+        config = {
+            "categories": DEFAULT_CATEGORIES,
+            "default_category": "general",
+            "created": datetime.now().isoformat()
+        }
+        CONFIG_FILE.write_text(json.dumps(config, indent=2))
+        print(f"✓ Created config at {CONFIG_FILE}")
+    
+    return True
+
+
+def load_vault():
+    """Load the prompt vault."""
+    if _session is not None:
+        return _session["vault"]
+    if not VAULT_FILE.exists():
+        init_vault()
+    with trace_phase("load_vault.read"):
+        raw = VAULT_FILE.read_bytes()
+        trace_count("bytes_read", len(raw))
+    with trace_phase("load_vault.parse"):
+        if COMPACT_RECORDS:
+            # Convert each prompt as it is parsed so the dicts never pile up
+            columns = PromptColumns()
+            vault = json.loads(raw, object_hook=lambda d: Prompt.from_dict(d, columns)
+                               if "id" in d and "content" in d else d)
+        else:
+            vault = json.loads(raw)
+    
+    # Use counts live in the usage store; it is authoritative once a prompt has a record
+    usage = load_usage()
+    if usage:
+        for p in vault["prompts"]:
+            if p["id"] in usage:
+                p["uses"] = usage[p["id"]]["uses"]
+    return vault
+
+
+def save_vault(vault):
+    """Save the prompt vault."""
+    if _session is not None and vault is _session["vault"]:
+        _session["dirty"] = True
+        return
+    _write_vault(vault)
+
+
+def _write_vault(vault):
+    """Serialize and write the vault and its derived files."""
+    vault["generation"] = vault.get("generation", 0) + 1
+    # Backfill size metadata for records written before it existed or edited by hand
+    for p in vault["prompts"]:
+        if _size_is_stale(p):
+            p["size"] = prompt_size(p["content"])
+            _mark_changed(p["id"])
+    with trace_phase("save_vault.serialize"):
+        data = json.dumps(vault, indent=2, default=_json_default).encode()
+    with trace_phase("save_vault.write"):
+        VAULT_FILE.write_bytes(data)
+        trace_count("bytes_written", len(data))
+    _refresh_name_cache(vault)
+    # The journal must land before the snapshot that watchers poll
+    _write_journal(vault["generation"])
+    write_snapshot(vault)
+
+
+@contextmanager
+def vault_session():
+    """Hold one in-memory vault across many operations.
+    
+    Inside the block the regular prompt functions share a single loaded
+    vault; changes are written once on exit or whenever the yielded commit
+    function is called.
+    """
+    global _session
+    if _session is not None:
+        # Nested sessions share the outer one
+        yield commit_session
+        return
+    _session = {"vault": load_vault(), "dirty": False}
+    try:
+        yield commit_session
+    finally:
+        try:
+            commit_session()
+        finally:
+            _session = None
+
+
+def commit_session():
+    """Write the session vault to disk if it changed since the last commit."""
+    if _session is None or not _session["dirty"]:
+        return False
+    _write_vault(_session["vault"])
+    _session["dirty"] = False
+    return True
+
+
+def load_config():
+    """Load configuration."""
+    if not CONFIG_FILE.exists():
+        init_vault()
+    return json.loads(CONFIG_FILE.read_text())
+
+
+def _mark_changed(prompt_id, deleted=False):
+    """Note a changed prompt for the change journal of the next write."""
+    if deleted:
+        _pending_changes["upserted"].discard(prompt_id)
+        _pending_changes["deleted"].add(prompt_id)
+    else:
+        _pending_changes["deleted"].discard(prompt_id)
+        _pending_changes["upserted"].add(prompt_id)
+
+
+def _write_journal(generation):
+    """Append the pending changes for a vault write to the change journal.
+    
+    A write with nothing marked changed (a caller editing a loaded vault and
+    calling save_vault directly) is journaled as "full", telling watchers to
+    reload instead of patching.
+    """
+    journal = VAULT_DIR / JOURNAL_FILENAME
+    record = {
+        "generation": generation,
+        "upserted": sorted(_pending_changes["upserted"]),
+        "deleted": sorted(_pending_changes["deleted"]),
+    }
+    if not record["upserted"] and not record["deleted"]:
+        record["full"] = True
+    entry = json.dumps(record) + "\n"
+    _pending_changes["upserted"].clear()
+    _pending_changes["deleted"].clear()
+    
+    mode = "a"
+    if journal.exists() and journal.stat().st_size > JOURNAL_MAX_BYTES:
+        mode = "w"
+    with open(journal, mode, encoding="utf-8") as f:
+        f.write(entry)
+    trace_count("bytes_written", len(entry))
+
+
+def generate_id(content):
+    """Generate a short unique ID for a prompt."""
+    return hashlib.md5(content.encode()).hexdigest()[:8]
+
+
+def _find_index(prompts, name_or_id):
+    """Return the index of the prompt matching a name or ID, or None."""
+    key = name_or_id.lower()
+    for i, p in enumerate(prompts):
+        if p["name"].lower() == key or p["id"] == name_or_id:
+            trace_count("records_scanned", i + 1)
+            return i
+    trace_count("records_scanned", len(prompts))
+    return None
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PROMPT MANAGEMENT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def add_prompt(name, content, category="general", tags=None, description=""):
+    """Add a new prompt to the vault."""
+    vault = load_vault()
+    
+    # Check for duplicate names
+    for p in vault["prompts"]:
+        if p["name"].lower() == name.lower():
+            print(f"✗ Prompt '{name}' already exists. Use 'update' to modify.")
+            return False
+    
+    if find_archived(name):
+        print(f"✗ Prompt '{name}' already exists (archived). Use 'update' to modify.")
+        return False
+    
+    pack = find_pack_prompt(name)
+    if pack:
+        print(f"✗ Prompt '{name}' already exists in pack '{pack[0]}'. Use 'update' to customize it.")
+        return False
+    
+    prompt = _new_prompt(name, content, category, tags, description)
+    vault["prompts"].append(prompt)
+    _mark_changed(prompt["id"])
+    save_vault(vault)
+    record_revision(prompt["id"], content)
+    print(f"✓ Added prompt '{name}' [{category}]")
+    return True
+
+
+def _new_prompt(name, content, category="general", tags=None, description=""):
+    """Build a new prompt record."""
+    now = datetime.now().isoformat()
+    return {
+        "id": generate_id(content + now),
+        "name": name,
+        "content": content,
+        "category": category,
+        "tags": tags or [],
+        "description": description,
+        "created": now,
+        "updated": now,
+        "uses": 0,
+        "size": prompt_size(content)
+    }
+
+
+def get_prompt(name_or_id):
+    """Get a prompt by name or ID."""
+    vault = load_vault()
+    
+    i = _find_index(vault["prompts"], name_or_id)
+    if i is not None:
+        return vault["prompts"][i]
+    return get_archived(name_or_id) or get_pack_prompt(name_or_id)
+
+
+def use_prompt(name_or_id, copy_to_clipboard=True):
+    """Get a prompt and optionally copy to clipboard."""
+    vault = load_vault()
+    
+    i = _find_index(vault["prompts"], name_or_id)
+    if i is None:
+        i = promote_archived(vault, name_or_id)
+    # Pack prompts are used in place; only their use counter is recorded
+    p = vault["prompts"][i] if i is not None else get_pack_prompt(name_or_id)
+    if p is None:
+        print(f"✗ Prompt '{name_or_id}' not found")
+        return None
+    
+    # Increment use counter (in place in the usage store)
+    p["uses"] = record_use(p["id"], base=p.get("uses", 0))
+    
+    content = p["content"]
+    
+    # Try to copy to clipboard
+    if copy_to_clipboard:
+        with trace_phase("clipboard"):
+            try:
+                import pyperclip
+                pyperclip.copy(content)
+                print(f"✓ Copied '{p['name']}' to clipboard!")
+            except ImportError:
+                print("(Install pyperclip for clipboard support: pip install pyperclip)")
+    
+    return content
+
+
+def list_prompts(category=None, tag=None, search=None, include_archived=False, max_tokens=None):
+    """List prompts with optional filters."""
+    cache = get_query_cache() if _session is None and QUERY_CACHE_ENABLED else None
+    if cache:
+        # The estimator decides max_tokens matches, so a new default must miss
+        key = json.dumps([(v or "").lower() for v in (category, tag, search)]
+                         + [include_archived, max_tokens, TOKEN_ESTIMATOR])
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    vault = load_vault()
+    prompts = vault["prompts"]
+    if include_archived:
+        prompts = prompts + load_archived()
+    # Filter pack prompts on metadata first; bodies are decoded only when the
+    # search looks inside them or for the records actually returned
+    prompts = prompts + load_pack_prompts(exclude=prompts, content=bool(search))
+    result = _filter_prompts(prompts, category, tag, search, max_tokens)
+    _fill_pack_content(result)
+    
+    if cache:
+        cache.put(key, result)
+    return result
+
+
+def _filter_prompts(prompts, category=None, tag=None, search=None, max_tokens=None):
+    """Apply list_prompts filters to a list of prompts."""
+    trace_count("records_scanned", len(prompts))
+    
+    # Apply filters
+    if category:
+        prompts = [p for p in prompts if p["category"].lower() == category.lower()]
+    
+    if tag:
+        prompts = [p for p in prompts if tag.lower() in [t.lower() for t in p.get("tags", [])]]
+    
+    if search:
+        search_lower = search.lower()
+        prompts = [p for p in prompts if 
+                   search_lower in p["name"].lower() or 
+                   search_lower in p["content"].lower() or
+                   search_lower in p.get("description", "").lower()]
+    
+    if max_tokens is not None:
+        prompts = [p for p in prompts if _stored_size(p)["tokens"] <= max_tokens]
+    
+    return prompts
+
+
+def delete_prompt(name_or_id):
+    """Delete a prompt."""
+    vault = load_vault()
+    
+    i = _find_index(vault["prompts"], name_or_id)
+    if i is None:
+        i = promote_archived(vault, name_or_id)
+    if i is None:
+        pack = find_pack_prompt(name_or_id)
+        if pack:
+            print(f"✗ Prompt '{name_or_id}' belongs to read-only pack '{pack[0]}'. "
+                  f"Use 'pack remove {pack[0]}' to drop the pack.")
+        else:
+            print(f"✗ Prompt '{name_or_id}' not found")
+        return False
+    
+    p = vault["prompts"].pop(i)
+    _mark_changed(p["id"], deleted=True)
+    save_vault(vault)
+    history_file = _history_file(p["id"])
+    if history_file.exists():
+        history_file.unlink()
+    if p.get("pack"):
+        print(f"✓ Deleted your copy of '{p['name']}' (pack '{p['pack']}' version is back)")
+    else:
+        print(f"✓ Deleted prompt '{p['name']}'")
+    return True
+
+
+def update_prompt(name_or_id, new_content=None, new_name=None, new_category=None, new_tags=None):
+    """Update an existing prompt."""
+    vault = load_vault()
+    
+    i = _find_index(vault["prompts"], name_or_id)
+    if i is None:
+        i = promote_archived(vault, name_or_id)
+    if i is None:
+        i = copy_pack_prompt(vault, name_or_id)
+    if i is None:
+        print(f"✗ Prompt '{name_or_id}' not found")
+        return False
+    
+    p = vault["prompts"][i]
+    old_name = p["name"]
+    if new_content and new_content != p["content"]:
+        record_revision(p["id"], new_content, previous=p["content"])
+        p["content"] = new_content
+        p["size"] = prompt_size(new_content)
+    if new_name:
+        p["name"] = new_name
+    if new_category:
+        p["category"] = new_category
+    if new_tags is not None:
+        p["tags"] = new_tags
+    
+    p["updated"] = datetime.now().isoformat()
+    _mark_changed(p["id"])
+    save_vault(vault)
+    print(f"✓ Updated prompt '{old_name}'")
+    return True
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# REVISION HISTORY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _history_file(prompt_id):
+    """Path of the revision file for a prompt id."""
+    return VAULT_DIR / HISTORY_DIRNAME / f"{prompt_id}.jsonl"
+
+
+def _pack(obj):
+    """Compress a JSON-serializable object into a base64 string."""
+    return base64.b64encode(zlib.compress(json.dumps(obj).encode())).decode("ascii")
+
+
+def _unpack(data):
+    """Inverse of _pack."""
+    return json.loads(zlib.decompress(base64.b64decode(data)))
+
+
+def _make_delta(old, new):
+    """Encode `new` as line ops against `old`.
+
+    An op is either [start, end] (copy those lines of `old`) or a string
+    (literal text to insert).
+    """
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(b[j1:j2]))
+    return ops
+
+
+def _apply_delta(old, ops):
+    """Rebuild content from its predecessor and a delta."""
+    a = old.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(a[op[0]:op[1]])
+    return "".join(parts)
+
+
+def _read_revisions(prompt_id):
+    """Read the raw revision entries for a prompt id."""
+    history_file = _history_file(prompt_id)
+    if not history_file.exists():
+        return []
+    with open(history_file, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _rebuild(entries, rev):
+    """Rebuild revision `rev` from the nearest snapshot at or before it."""
+    start = rev - 1
+    while entries[start]["kind"] != "full":
+        start -= 1
+    content = _unpack(entries[start]["data"])
+    for entry in entries[start + 1:rev]:
+        content = _apply_delta(content, _unpack(entry["data"]))
+    return content
+
+
+def record_revision(prompt_id, content, previous=None):
+    """Append a new revision for a prompt and return its number.
+
+    If the prompt has no history yet and `previous` is given, the previous
+    content is recorded first as revision 1.
+    """
+    entries = _read_revisions(prompt_id)
+    if not entries and previous is not None:
+        record_revision(prompt_id, previous)
+        entries = _read_revisions(prompt_id)
+
+    rev = len(entries) + 1
+    entry = {"rev": rev, "timestamp": datetime.now().isoformat(), "size": len(content)}
+    if (rev - 1) % SNAPSHOT_INTERVAL == 0:
+        entry["kind"] = "full"
+        entry["data"] = _pack(content)
+    else:
+        entry["kind"] = "delta"
+        entry["data"] = _pack(_make_delta(_rebuild(entries, rev - 1), content))
+
+    history_file = _history_file(prompt_id)
+    history_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+    return rev
+
+
+def get_history(name_or_id):
+    """List revision metadata for a prompt (oldest first)."""
+    prompt = get_prompt(name_or_id)
+    if not prompt:
+        return None
+    entries = _read_revisions(prompt["id"])
+    if not entries:
+        # Prompts created before history existed start at their current content
+        return [{"rev": 1, "timestamp": prompt["updated"], "kind": "full",
+                 "size": len(prompt["content"])}]
+    return [{k: e[k] for k in ("rev", "timestamp", "kind", "size")} for e in entries]
+
+
+def get_revision(name_or_id, rev):
+    """Return the content of a prompt at revision `rev`."""
+    prompt = get_prompt(name_or_id)
+    if not prompt:
+        return None
+    entries = _read_revisions(prompt["id"])
+    if not entries:
+        return prompt["content"] if rev == 1 else None
+    if not 1 <= rev <= len(entries):
+        return None
+    return _rebuild(entries, rev)
+
+
+def diff_revisions(name_or_id, rev1, rev2):
+    """Return a unified diff between two revisions of a prompt."""
+    old = get_revision(name_or_id, rev1)
+    new = get_revision(name_or_id, rev2)
+    if old is None or new is None:
+        return None
+    return "".join(difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True),
+        fromfile=f"r{rev1}", tofile=f"r{rev2}"))
+
+
+def revert_prompt(name_or_id, rev):
+    """Restore a prompt's content to revision `rev` (recorded as a new revision)."""
+    content = get_revision(name_or_id, rev)
+    if content is None:
+        print(f"✗ Revision r{rev} of '{name_or_id}' not found")
+        return False
+    return update_prompt(name_or_id, new_content=content)
+
+
+def parse_revision(value):
+    """Parse a revision argument such as 'r3' or '3'."""
+    try:
+        return int(value[1:] if value.lower().startswith("r") else value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid revision: {value}")
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# USAGE ANALYTICS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _usage_file():
+    """Path of the usage store."""
+    return VAULT_DIR / USAGE_FILENAME
+
+
+def _decay(hot, elapsed_seconds):
+    """Decay a hotness score by the elapsed time."""
+    return hot * 0.5 ** (elapsed_seconds / (HOT_HALF_LIFE_DAYS * 86400))
+
+
+def _usage_key(prompt_id):
+    """Fixed-width usage record key for a prompt id.
+    
+    Ids of up to 8 ASCII characters (all generated ids) are stored as-is, so
+    existing usage files keep matching. Longer or non-ASCII ids are stored as
+    0xFF followed by a 7-byte BLAKE2b digest, which no ASCII id can equal.
+    """
+    raw = prompt_id.encode("utf-8")
+    if len(raw) <= 8 and raw.isascii() and b"\0" not in raw:
+        return raw.ljust(8, b"\0")
+    return b"\xff" + hashlib.blake2b(raw, digest_size=7).digest()
+
+
+class _UsageRecords(dict):
+    """Usage records keyed by record key, looked up by prompt id."""
+    
+    def __getitem__(self, prompt_id):
+        return dict.__getitem__(self, _usage_key(prompt_id))
+    
+    def __contains__(self, prompt_id):
+        return dict.__contains__(self, _usage_key(prompt_id))
+    
+    def get(self, prompt_id, default=None):
+        return dict.get(self, _usage_key(prompt_id), default)
+
+
+def _scan_usage_slots(path):
+    """Map record keys to record slots by scanning the usage store."""
+    slots = {}
+    if path.exists():
+        data = path.read_bytes()
+        for slot in range(len(data) // _USAGE_RECORD_SIZE):
+            offset = slot * _USAGE_RECORD_SIZE
+            slots[data[offset:offset + 8]] = slot
+    _usage_slots[str(path)] = slots
+    return slots
+
+
+def record_use(prompt_id, base=0, now=None):
+    """Record one use of a prompt and return its new lifetime count.
+
+    Only the prompt's own record is read and rewritten. `base` seeds the
+    lifetime count for prompts that predate the usage store.
+    """
+    now = time.time() if now is None else now
+    path = _usage_file()
+    key = _usage_key(prompt_id)
+    slot = _usage_slots.get(str(path), {}).get(key)
+    if slot is None:
+        slot = _scan_usage_slots(path).get(key)
+    
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "r+b" if path.exists() else "w+b") as f:
+        if slot is None:
+            f.seek(0, os.SEEK_END)
+            slot = f.tell() // _USAGE_RECORD_SIZE
+            total, last, hot = base, now, 0.0
+            counts = array.array("H", bytes(2 * USAGE_WINDOW_DAYS))
+            _usage_slots.setdefault(str(path), {})[key] = slot
+        else:
+            f.seek(slot * _USAGE_RECORD_SIZE)
+            raw = f.read(_USAGE_RECORD_SIZE)
+            trace_count("bytes_read", len(raw))
+            _, total, last, hot = _USAGE_HEADER.unpack_from(raw)
+            counts = array.array("H", raw[_USAGE_HEADER.size:])
+        
+        # Roll the ring forward, clearing days that passed without a use
+        today, last_day = int(now // 86400), int(last // 86400)
+        for day in range(last_day + 1, min(today, last_day + USAGE_WINDOW_DAYS) + 1):
+            counts[day % USAGE_WINDOW_DAYS] = 0
+        counts[today % USAGE_WINDOW_DAYS] = min(counts[today % USAGE_WINDOW_DAYS] + 1, 0xFFFF)
+        total += 1
+        hot = _decay(hot, max(now - last, 0)) + 1.0
+        
+        f.seek(slot * _USAGE_RECORD_SIZE)
+        f.write(_USAGE_HEADER.pack(key, total, max(now, last), hot))
+        f.write(counts.tobytes())
+        trace_count("bytes_written", _USAGE_RECORD_SIZE)
+    return total
+
+
+def load_usage():
+    """Read the whole usage store into {id: {"uses", "last", "hot", "counts"}}."""
+    path = _usage_file()
+    if not path.exists():
+        return _UsageRecords()
+    data = path.read_bytes()
+    trace_count("bytes_read", len(data))
+    usage = _UsageRecords()
+    slots = {}
+    for slot in range(len(data) // _USAGE_RECORD_SIZE):
+        offset = slot * _USAGE_RECORD_SIZE
+        key, total, last, hot = _USAGE_HEADER.unpack_from(data, offset)
+        start = offset + _USAGE_HEADER.size
+        dict.__setitem__(usage, key, {
+            "uses": total,
+            "last": last,
+            "hot": hot,
+            "counts": array.array("H", data[start:start + 2 * USAGE_WINDOW_DAYS]),
+        })
+        slots[key] = slot
+    _usage_slots[str(path)] = slots
+    return usage
+
+
+def hotness(record, now=None):
+    """Current decayed hotness of a usage record."""
+    now = time.time() if now is None else now
+    return _decay(record["hot"], max(now - record["last"], 0))
+
+
+def uses_in_window(record, days, now=None):
+    """Number of uses recorded in the last `days` days (including today)."""
+    now = time.time() if now is None else now
+    days = min(days, USAGE_WINDOW_DAYS)
+    today, last_day = int(now // 86400), int(record["last"] // 86400)
+    return sum(record["counts"][day % USAGE_WINDOW_DAYS]
+               for day in range(today - days + 1, today + 1) if day <= last_day
+               and day > last_day - USAGE_WINDOW_DAYS)
+
+
+def parse_days(value):
+    """Parse a duration such as '180d', '4w' or '30' into days."""
+    units = {"d": 1, "w": 7}
+    try:
+        if value[-1:].lower() in units:
+            return int(value[:-1]) * units[value[-1].lower()]
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid duration: {value}")
+
+
+def parse_window(value):
+    """Parse a window argument such as '7d' or '30' into days."""
+    days = parse_days(value)
+    if not 1 <= days <= USAGE_WINDOW_DAYS:
+        raise argparse.ArgumentTypeError(f"window must be 1-{USAGE_WINDOW_DAYS} days")
+    return days
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# COLD ARCHIVE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _load_archive_index():
+    """Load the archive index: {"entries": {id: {name, offset, length}}, "dead": bytes}."""
+    path = VAULT_DIR / ARCHIVE_INDEX
+    if not path.exists():
+        return {"entries": {}, "dead": 0}
+    return json.loads(path.read_text())
+
+
+def _save_archive_index(index):
+    """Atomically replace the archive index."""
+    path = VAULT_DIR / ARCHIVE_INDEX
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(index))
+    os.replace(tmp, path)
+
+
+def _read_archived(entry, segment=None):
+    """Decompress one archived record from the segment."""
+    if segment is None:
+        with open(VAULT_DIR / ARCHIVE_SEGMENT, "rb") as f:
+            return _read_archived(entry, f)
+    segment.seek(entry["offset"])
+    data = segment.read(entry["length"])
+    trace_count("bytes_read", len(data))
+    return json.loads(zlib.decompress(data))
+
+
+def find_archived(name_or_id, index=None):
+    """Return the archived prompt id for a name or ID, or None."""
+    index = index or _load_archive_index()
+    if name_or_id in index["entries"]:
+        return name_or_id
+    key = name_or_id.lower()
+    for prompt_id, entry in index["entries"].items():
+        if entry["name"].lower() == key:
+            return prompt_id
+    return None
+
+
+def get_archived(name_or_id):
+    """Read an archived prompt without promoting it (None if not archived)."""
+    index = _load_archive_index()
+    prompt_id = find_archived(name_or_id, index)
+    if prompt_id is None:
+        return None
+    prompt = _read_archived(index["entries"][prompt_id])
+    prompt["archived"] = True
+    return prompt
+
+
+def load_archived():
+    """Read every archived prompt (used by `search --all`)."""
+    index = _load_archive_index()
+    if not index["entries"]:
+        return []
+    with open(VAULT_DIR / ARCHIVE_SEGMENT, "rb") as f:
+        prompts = [_read_archived(e, f) for e in sorted(index["entries"].values(),
+                                                         key=lambda e: e["offset"])]
+    for p in prompts:
+        p["archived"] = True
+    return prompts
+
+
+def _drop_archived(index, prompt_ids):
+    """Remove ids from the archive index, compacting the segment when mostly dead."""
+    for prompt_id in prompt_ids:
+        entry = index["entries"].pop(prompt_id, None)
+        if entry:
+            index["dead"] += entry["length"]
+    
+    live = sum(e["length"] for e in index["entries"].values())
+    if index["dead"] > max(live, ARCHIVE_COMPACT_MIN_BYTES) or not index["entries"]:
+        segment = VAULT_DIR / ARCHIVE_SEGMENT
+        tmp = segment.with_suffix(".tmp")
+        with open(segment, "rb") as src, open(tmp, "wb") as dst:
+            for entry in sorted(index["entries"].values(), key=lambda e: e["offset"]):
+                src.seek(entry["offset"])
+                data = src.read(entry["length"])
+                entry["offset"] = dst.tell()
+                dst.write(data)
+        os.replace(tmp, segment)
+        index["dead"] = 0
+    _save_archive_index(index)
+
+
+def promote_archived(vault, name_or_id):
+    """Move an archived prompt back into the (loaded) vault; return its index or None."""
+    index = _load_archive_index()
+    prompt_id = find_archived(name_or_id, index)
+    if prompt_id is None:
+        return None
+    prompt = _read_archived(index["entries"][prompt_id])
+    vault["prompts"].append(prompt)
+    _mark_changed(prompt_id)
+    # Persist the hot copy before dropping the archived one; inside a batch
+    # session save_vault only marks the vault dirty, so commit it now
+    save_vault(vault)
+    commit_session()
+    _drop_archived(index, [prompt_id])
+    return len(vault["prompts"]) - 1
+
+
+def _last_active(prompt, usage):
+    """Epoch seconds of a prompt's last use or edit."""
+    stamp = prompt.get("updated") or prompt.get("created")
+    # No timestamps at all: age unknown, so never treat the prompt as cold
+    last = datetime.fromisoformat(stamp).timestamp() if stamp else float("inf")
+    if prompt["id"] in usage:
+        last = max(last, usage[prompt["id"]]["last"])
+    return last
+
+
+def archive_prompts(unused_for_days, dry_run=False, now=None):
+    """Move prompts not used or edited for `unused_for_days` into the cold archive."""
+    now = time.time() if now is None else now
+    cutoff = now - unused_for_days * 86400
+    vault = load_vault()
+    usage = load_usage()
+    cold = [p for p in vault["prompts"] if _last_active(p, usage) < cutoff]
+    
+    if dry_run or not cold:
+        for p in cold:
+            print(f"  • {p['name']}")
+        print(f"{'Would archive' if dry_run else 'Archived'} {len(cold)} prompts "
+              f"unused for {unused_for_days} days")
+        return [p["name"] for p in cold]
+    
+    index = _load_archive_index()
+    with open(VAULT_DIR / ARCHIVE_SEGMENT, "ab") as f:
+        for p in cold:
+            data = zlib.compress(json.dumps(p, default=_json_default).encode("utf-8"))
+            index["entries"][p["id"]] = {"name": p["name"], "offset": f.tell(), "length": len(data)}
+            f.write(data)
+            trace_count("bytes_written", len(data))
+        f.flush()
+        os.fsync(f.fileno())
+    _save_archive_index(index)
+    
+    cold_ids = {p["id"] for p in cold}
+    vault["prompts"] = [p for p in vault["prompts"] if p["id"] not in cold_ids]
+    for prompt_id in cold_ids:
+        _mark_changed(prompt_id, deleted=True)
+    save_vault(vault)
+    print(f"✓ Archived {len(cold)} prompts unused for {unused_for_days} days")
+    return [p["name"] for p in cold]
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# QUERY CACHE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def vault_generation():
+    """Cheap token that changes whenever the vault, its uses, archive or packs change.
+    
+    Combines the snapshot's generation counter (bumped on every vault write)
+    with stat signatures, so hand edits and use counts invalidate it too.
+    """
+    generation = None
+    try:
+        with open(VAULT_DIR / SNAPSHOT_FILENAME, "rb") as f:
+            generation = _SNAP_HEADER.unpack(f.read(_SNAP_HEADER.size))[1]
+    except (OSError, struct.error):
+        pass
+    return [generation] + [_stat_signature(path) for path in
+                           (VAULT_FILE, VAULT_DIR / USAGE_FILENAME, VAULT_DIR / ARCHIVE_INDEX,
+                            VAULT_DIR / PACKS_DIRNAME)]
+
+
+class QueryCache:
+    """Persistent LRU of serialized query results, tied to one vault generation."""
+    
+    def __init__(self, path):
+        self.path = path
+        self.stats_path = path.with_name(QUERY_CACHE_STATS_FILENAME)
+        self.token = None
+        self.read_token = None  # generation seen by the last get()
+        self.hits = self.misses = 0
+        self.entries = OrderedDict()
+        self.size = 0
+        try:
+            self.hits, self.misses = _QUERY_CACHE_STATS.unpack(self.stats_path.read_bytes())
+        except (OSError, struct.error):
+            pass
+        if path.exists():
+            try:
+                data = json.loads(path.read_text())
+                self.token = data["token"]
+                for key, value in data["entries"]:
+                    self.entries[key] = value
+                    self.size += len(value)
+            except (ValueError, KeyError, TypeError):
+                pass  # corrupt cache: start over
+    
+    def _validate(self):
+        # JSON round trip so the token compares equal to a persisted one
+        token = json.loads(json.dumps(vault_generation()))
+        if token != self.token:
+            self.token = token
+            self.entries.clear()
+            self.size = 0
+        return token
+    
+    def get(self, key):
+        """Cached result for key, or None.
+        
+        Remembers the vault generation it saw, so a put() of a result
+        computed after this miss is dropped if the vault changed meanwhile.
+        """
+        self.read_token = self._validate()
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            trace_count("query_cache_misses")
+            return None
+        # Recency from hits is kept in memory only; the entries are rewritten on put
+        self.entries.move_to_end(key)
+        self.hits += 1
+        trace_count("query_cache_hits")
+        self.save_counters()
+        return json.loads(value)
+    
+    def put(self, key, result):
+        """Store a result, evicting least recently used entries over the bounds.
+        
+        Nothing is stored if the vault changed since the last get(): the
+        result may have been read before that change.
+        """
+        read_token, self.read_token = self.read_token, None
+        if self._validate() != read_token and read_token is not None:
+            return
+        value = json.dumps(result, default=_json_default)
+        if len(value) <= QUERY_CACHE_MAX_BYTES:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = value
+            self.size += len(value)
+            while len(self.entries) > QUERY_CACHE_MAX_ENTRIES or self.size > QUERY_CACHE_MAX_BYTES:
+                self.size -= len(self.entries.popitem(last=False)[1])
+        self.save()
+    
+    def clear(self):
+        """Drop all entries (counters are kept)."""
+        self.entries.clear()
+        self.size = 0
+        self.save()
+    
+    def save(self):
+        """Atomically persist the cache next to the vault."""
+        data = json.dumps({"token": self.token, "entries": list(self.entries.items())})
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            tmp.write_text(data)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # caching is best effort
+        self.save_counters()
+    
+    def save_counters(self):
+        """Persist the hit/miss counters (a 16-byte write)."""
+        try:
+            self.stats_path.write_bytes(_QUERY_CACHE_STATS.pack(self.hits, self.misses))
+        except OSError:
+            pass
+    
+    def stats(self):
+        """Hit/miss counters and current size."""
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self.entries), "bytes": self.size}
+
+
+def get_query_cache():
+    """The query cache for the current vault directory."""
+    global _query_cache
+    path = VAULT_DIR / QUERY_CACHE_FILENAME
+    if _query_cache is None or _query_cache.path != path:
+        _query_cache = QueryCache(path)
+    return _query_cache
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PROMPT PACKS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _pack_paths():
+    """Installed pack snapshot files, in lookup order (by pack name)."""
+    packs_dir = VAULT_DIR / PACKS_DIRNAME
+    if not packs_dir.is_dir():
+        return []
+    return sorted(packs_dir.glob("*.snap"))
+
+
+def _packs():
+    """Yield (pack name, mapped snapshot) for every installed pack.
+    
+    Snapshots are mapped on first use and remapped when reinstalled; the OS
+    only pages in the parts of a pack a lookup actually touches.
+    """
+    paths = _pack_paths()
+    for key in set(_open_packs) - {str(p) for p in paths}:
+        _open_packs.pop(key).close()
+    for path in paths:
+        snapshot = _open_packs.get(str(path))
+        if snapshot is None:
+            snapshot = _open_packs[str(path)] = VaultSnapshot(path)
+        else:
+            snapshot.refresh()
+        yield path.stem, snapshot
+
+
+def _pack_record(pack, snapshot, i, usage=None, content=True):
+    """Prompt dict for record i of a pack, with current use counts.
+    
+    With content=False only the metadata is decoded and the record has no
+    "content" key.
+    """
+    prompt = snapshot.metadata(i)
+    if content:
+        prompt["content"] = snapshot.content(i)
+    elif _size_is_stale(prompt):
+        # Pack installed before size metadata: size filters need the body once
+        prompt["size"] = prompt_size(snapshot.content(i))
+    prompt["pack"] = pack
+    usage = load_usage() if usage is None else usage
+    if prompt["id"] in usage:
+        prompt["uses"] = usage[prompt["id"]]["uses"]
+    return prompt
+
+
+def find_pack_prompt(name_or_id):
+    """Return (pack name, snapshot, record number) for a pack prompt, or None."""
+    for pack, snapshot in _packs():
+        i = snapshot.find(name_or_id)
+        if i is not None:
+            return pack, snapshot, i
+    return None
+
+
+def get_pack_prompt(name_or_id):
+    """Read a prompt from the installed packs (None if no pack has it)."""
+    found = find_pack_prompt(name_or_id)
+    return _pack_record(*found) if found else None
+
+
+def load_pack_prompts(exclude=(), content=True):
+    """All pack prompts not overridden by (same name or ID as) a prompt in `exclude`.
+    
+    With content=False the records carry metadata only (no "content" key),
+    for callers that never look at prompt bodies.
+    """
+    names = {p["name"].lower() for p in exclude}
+    ids = {p["id"] for p in exclude}
+    usage = None
+    prompts = []
+    for pack, snapshot in _packs():
+        usage = load_usage() if usage is None else usage
+        for i in range(len(snapshot)):
+            name = snapshot.name(i).lower()
+            if name in names:
+                continue
+            prompt = _pack_record(pack, snapshot, i, usage, content)
+            if prompt["id"] not in ids:
+                names.add(name)
+                prompts.append(prompt)
+    return prompts
+
+
+def _fill_pack_content(prompts):
+    """Decode the body of every metadata-only pack record in `prompts`."""
+    snapshots = None
+    for p in prompts:
+        if "content" not in p:
+            snapshots = dict(_packs()) if snapshots is None else snapshots
+            snapshot = snapshots[p["pack"]]
+            p["content"] = snapshot.content(snapshot.find_id(p["id"]))
+
+
+def copy_pack_prompt(vault, name_or_id):
+    """Copy a pack prompt into the (loaded) vault for editing; return its index or None."""
+    prompt = get_pack_prompt(name_or_id)
+    if prompt is None:
+        return None
+    vault["prompts"].append(prompt)
+    _mark_changed(prompt["id"])
+    return len(vault["prompts"]) - 1
+
+
+def install_pack(filepath, name=None):
+    """Compile a prompt JSON file (import format) into a read-only pack."""
+    name = name or Path(filepath).stem
+    try:
+        data = json.loads(Path(filepath).read_text())
+    except (OSError, ValueError) as e:
+        print(f"✗ Cannot read pack: {e}")
+        return False
+    prompts = data.get("prompts", data) if isinstance(data, dict) else data
+    if not isinstance(prompts, list):
+        print("✗ Invalid pack file format")
+        return False
+    
+    now = datetime.now().isoformat()
+    records, seen = [], set()
+    for p in prompts:
+        if "name" not in p or "content" not in p or p["name"].lower() in seen:
+            continue
+        seen.add(p["name"].lower())
+        records.append({
+            # Stable ids keep use counts and user copies attached across pack updates
+            "id": generate_id(f"pack:{name}:{p['name'].lower()}"),
+            "name": p["name"],
+            "content": p["content"],
+            "category": p.get("category", "general"),
+            "tags": p.get("tags", []),
+            "description": p.get("description", ""),
+            "created": p.get("created", now),
+            "updated": p.get("updated", now),
+            "uses": 0,
+            "size": prompt_size(p["content"]),
+        })
     
+    packs_dir = VAULT_DIR / PACKS_DIRNAME
+    packs_dir.mkdir(parents=True, exist_ok=True)
+    write_snapshot({"prompts": records, "generation": time.time_ns()}, packs_dir / f"{name}.snap")
+    _refresh_name_cache()
+    print(f"✓ Installed pack '{name}' ({len(records)} prompts)")
     return True
 
 
-def load_vault():
-    """Load the prompt vault."""
-    if not VAULT_FILE.exists():
-        init_vault()
-    return json.loads(VAULT_FILE.read_text())
+def remove_pack(name):
+    """Uninstall a pack (user copies of its prompts stay in the vault)."""
+    path = VAULT_DIR / PACKS_DIRNAME / f"{name}.snap"
+    if not path.exists():
+        print(f"✗ Pack '{name}' is not installed")
+        return False
+    snapshot = _open_packs.pop(str(path), None)
+    if snapshot:
+        snapshot.close()
+    path.unlink()
+    _refresh_name_cache()
+    print(f"✓ Removed pack '{name}'")
+    return True
 
 
-def save_vault(vault):
-    """Save the prompt vault."""
-    VAULT_FILE.write_text(json.dumps(vault, indent=2))
+def list_packs():
+    """Installed packs as [(name, prompt count)]."""
+    return [(pack, len(snapshot)) for pack, snapshot in _packs()]
 
 
-def load_config():
-    """Load configuration."""
-    if not CONFIG_FILE.exists():
-        init_vault()
-    return json.loads(CONFIG_FILE.read_text())
+# ═══════════════════════════════════════════════════════════════════════════════
+# SHELL COMPLETION
+# ═══════════════════════════════════════════════════════════════════════════════
 
+def _refresh_name_cache(vault=None):
+    """Rewrite the name cache from the vault, the archive and installed packs."""
+    vault = vault or load_vault()
+    names = vault["prompts"] + list(_load_archive_index()["entries"].values())
+    for _, snapshot in _packs():
+        names += [{"name": n} for n in snapshot.names()]
+    write_name_cache(names)
 
-def generate_id(content):
-    """Generate a short unique ID for a prompt."""
-    return hashlib.md5(content.encode()).hexdigest()[:8]
+
+def write_name_cache(prompts):
+    """Rewrite the sorted name cache used by shell completion."""
+    names = sorted(p["name"].encode("utf-8") for p in prompts if "\n" not in p["name"])
+    data = b"\n".join(names) + (b"\n" if names else b"")
+    cache = VAULT_DIR / NAMES_FILENAME
+    tmp = cache.with_suffix(".tmp")
+    with trace_phase("save_vault.name_cache"):
+        tmp.write_bytes(data)
+        # Atomic swap so a concurrent completion never maps a partial file
+        os.replace(tmp, cache)
+        trace_count("bytes_written", len(data))
+
+
+def completion_script(shell, commands):
+    """Return a bash, zsh or fish completion script for pv/prompt-vault."""
+    helper = " ".join(shlex.quote(str(x)) for x in (
+        sys.executable, "-S", COMPLETION_HELPER, "--cache", VAULT_DIR / NAMES_FILENAME))
+    words = " ".join(commands)
+    
+    if shell == "bash":
+        return f"""_pv_complete() {{
+    local cur="${{COMP_WORDS[COMP_CWORD]}}"
+    if [ "$COMP_CWORD" -eq 1 ]; then
+        COMPREPLY=( $(compgen -W "{words}" -- "$cur") )
+    elif [ "$COMP_CWORD" -eq 2 ]; then
+        case "${{COMP_WORDS[1]}}" in
+            {"|".join(NAME_COMMANDS)})
+                local IFS=$'\\n'
+                COMPREPLY=( $({helper} "$cur") ) ;;
+        esac
+    fi
+}}
+complete -F _pv_complete pv prompt-vault
+"""
+    if shell == "zsh":
+        return f"""#compdef pv prompt-vault
+_pv() {{
+    if (( CURRENT == 2 )); then
+        compadd -- {words}
+    elif (( CURRENT == 3 )); then
+        case $words[2] in
+            ({"|".join(NAME_COMMANDS)})
+                compadd -- ${{(f)"$({helper} "$PREFIX")"}} ;;
+        esac
+    fi
+}}
+compdef _pv pv prompt-vault
+"""
+    if shell == "fish":
+        return f"""for cmd in pv prompt-vault
+    complete -c $cmd -f -n "__fish_use_subcommand" -a "{words}"
+    complete -c $cmd -f -n "__fish_seen_subcommand_from {" ".join(NAME_COMMANDS)}" -a "({helper} (commandline -ct))"
+end
+"""
+    raise ValueError(f"Unsupported shell: {shell}")
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
-# PROMPT MANAGEMENT
+# SHARED SNAPSHOT
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def add_prompt(name, content, category="general", tags=None, description=""):
-    """Add a new prompt to the vault."""
-    vault = load_vault()
+def write_snapshot(vault, path=None):
+    """Write the vault as a memory-mappable, indexed snapshot file."""
+    path = Path(path) if path else VAULT_DIR / SNAPSHOT_FILENAME
+    prompts = vault["prompts"]
+    blob = bytearray()
     
-    # Check for duplicate names
-    for p in vault["prompts"]:
-        if p["name"].lower() == name.lower():
-            print(f"✗ Prompt '{name}' already exists. Use 'update' to modify.")
-            return False
+    def put(data):
+        offset = len(blob)
+        blob.extend(data)
+        return offset, len(data)
     
-    prompt = {
-        "id": generate_id(content + str(datetime.now())),
-        "name": name,
-        "content": content,
-        "category": category,
-        "tags": tags or [],
-        "description": description,
-        "created": datetime.now().isoformat(),
-        "updated": datetime.now().isoformat(),
-        "uses": 0
-    }
+    records, name_keys, id_keys = [], [], []
+    for i, p in enumerate(prompts):
+        meta = {k: v for k, v in p.items() if k != "content"}
+        name = put(p["name"].encode("utf-8"))
+        records.append(name + put(json.dumps(meta).encode("utf-8"))
+                       + put(p["content"].encode("utf-8")))
+        name_keys.append((p["name"].lower().encode("utf-8"), i))
+        id_keys.append((p["id"].encode("utf-8"), i))
     
-    vault["prompts"].append(prompt)
-    save_vault(vault)
-    print(f"✓ Added prompt '{name}' [{category}]")
-    return True
+    with trace_phase("save_vault.snapshot"):
+        records_off = _SNAP_HEADER.size
+        name_off = records_off + _SNAP_RECORD.size * len(prompts)
+        id_off = name_off + _SNAP_INDEX.size * len(prompts)
+        blob_off = id_off + _SNAP_INDEX.size * len(prompts)
+        
+        out = bytearray(_SNAP_HEADER.pack(SNAPSHOT_MAGIC, vault.get("generation", 0), len(prompts),
+                                          records_off, name_off, id_off, blob_off))
+        for rec in records:
+            out += _SNAP_RECORD.pack(*rec)
+        for keys in (name_keys, id_keys):
+            # Index keys live in the blob so lookups compare bytes in place
+            for key, i in sorted(keys):
+                offset, length = put(key)
+                out += _SNAP_INDEX.pack(offset, length, i)
+        out += blob
+        
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(out)
+        # Atomic swap: mapped readers keep the old inode until they remap
+        os.replace(tmp, path)
+        trace_count("bytes_written", len(out))
 
 
-def get_prompt(name_or_id):
-    """Get a prompt by name or ID."""
-    vault = load_vault()
+class _IndexKeys:
+    """Sequence view of one snapshot index's keys, for bisect."""
     
-    for p in vault["prompts"]:
-        if p["name"].lower() == name_or_id.lower() or p["id"] == name_or_id:
-            return p
-    return None
+    def __init__(self, snapshot, offset):
+        self.snapshot = snapshot
+        self.offset = offset
+    
+    def __len__(self):
+        return self.snapshot.count
+    
+    def __getitem__(self, i):
+        key_off, key_len, _ = _SNAP_INDEX.unpack_from(self.snapshot.mm, self.offset + i * _SNAP_INDEX.size)
+        start = self.snapshot.blob_off + key_off
+        return self.snapshot.mm[start:start + key_len]
+    
+    def record(self, i):
+        return _SNAP_INDEX.unpack_from(self.snapshot.mm, self.offset + i * _SNAP_INDEX.size)[2]
 
 
-def use_prompt(name_or_id, copy_to_clipboard=True):
-    """Get a prompt and optionally copy to clipboard."""
-    vault = load_vault()
+class VaultSnapshot:
+    """Read-only, memory-mapped view of a vault snapshot.
     
-    for i, p in enumerate(vault["prompts"]):
-        if p["name"].lower() == name_or_id.lower() or p["id"] == name_or_id:
-            # Increment use counter
-            vault["prompts"][i]["uses"] += 1
-            save_vault(vault)
-            
-            content = p["content"]
-            
-            # Try to copy to clipboard
-            if copy_to_clipboard:
-                try:
-                    import pyperclip
-                    pyperclip.copy(content)
-                    print(f"✓ Copied '{p['name']}' to clipboard!")
-                except ImportError:
-                    print("(Install pyperclip for clipboard support: pip install pyperclip)")
-            
-            return content
+    Lookups binary-search the mapped indexes and only decode the records
+    they return, so many processes can share one copy of the vault through
+    the OS page cache. Use counts are as of the last vault write.
+    """
     
-    print(f"✗ Prompt '{name_or_id}' not found")
-    return None
+    def __init__(self, path=None):
+        self.path = Path(path) if path else VAULT_DIR / SNAPSHOT_FILENAME
+        with open(self.path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.generation, self.count, self.records_off, name_off, id_off, self.blob_off = \
+            _SNAP_HEADER.unpack_from(self.mm)
+        if magic != SNAPSHOT_MAGIC:
+            self.mm.close()
+            raise ValueError(f"{self.path} is not a prompt vault snapshot")
+        self._names = _IndexKeys(self, name_off)
+        self._ids = _IndexKeys(self, id_off)
+    
+    def __len__(self):
+        return self.count
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        """Unmap the snapshot."""
+        self.mm.close()
+    
+    def is_stale(self):
+        """True if a newer snapshot generation has been written since mapping."""
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(_SNAP_HEADER.size)
+        except OSError:
+            return True
+        return _SNAP_HEADER.unpack(header)[1] != self.generation
+    
+    def refresh(self):
+        """Remap the snapshot if it is stale. Returns True if it was remapped."""
+        if not self.is_stale():
+            return False
+        self.close()
+        self.__init__(self.path)
+        return True
+    
+    def _field(self, i, field):
+        values = _SNAP_RECORD.unpack_from(self.mm, self.records_off + i * _SNAP_RECORD.size)
+        start = self.blob_off + values[2 * field]
+        return self.mm[start:start + values[2 * field + 1]].decode("utf-8")
+    
+    def _lookup(self, keys, key):
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return keys.record(i)
+        return None
+    
+    def find(self, name_or_id):
+        """Return the record number for a name or ID, or None."""
+        i = self._lookup(self._names, name_or_id.lower().encode("utf-8"))
+        if i is None:
+            i = self.find_id(name_or_id)
+        return i
+    
+    def find_id(self, prompt_id):
+        """Return the record number for an exact ID, or None."""
+        return self._lookup(self._ids, prompt_id.encode("utf-8"))
+    
+    def name(self, i):
+        """Name of record i."""
+        return self._field(i, 0)
+    
+    def metadata(self, i):
+        """Record i without its content."""
+        return json.loads(self._field(i, 1))
+    
+    def content(self, i):
+        """Content of record i."""
+        return self._field(i, 2)
+    
+    def get(self, name_or_id):
+        """Full prompt dict for a name or ID, or None."""
+        i = self.find(name_or_id)
+        if i is None:
+            return None
+        prompt = self.metadata(i)
+        prompt["content"] = self.content(i)
+        return prompt
+    
+    def names(self):
+        """All prompt names, in vault order."""
+        return [self.name(i) for i in range(self.count)]
+    
+    def list(self, category=None, tag=None):
+        """Metadata (without content) of prompts matching the filters."""
+        result = []
+        for i in range(self.count):
+            meta = self.metadata(i)
+            if category and meta["category"].lower() != category.lower():
+                continue
+            if tag and tag.lower() not in [t.lower() for t in meta.get("tags", [])]:
+                continue
+            result.append(meta)
+        return result
 
 
-def list_prompts(category=None, tag=None, search=None):
-    """List prompts with optional filters."""
-    vault = load_vault()
-    prompts = vault["prompts"]
+def open_snapshot(path=None):
+    """Map the vault snapshot, building it first if it does not exist yet."""
+    path = Path(path) if path else VAULT_DIR / SNAPSHOT_FILENAME
+    if not path.exists():
+        write_snapshot(load_vault(), path)
+    return VaultSnapshot(path)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# WATCHER
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _stat_signature(path):
+    """Cheap change signature for a file (None if missing)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class VaultWatcher:
+    """In-memory vault for long-running embedders, kept fresh by polling.
     
-    # Apply filters
-    if category:
-        prompts = [p for p in prompts if p["category"].lower() == category.lower()]
+    poll() stats the snapshot and prompts.json. When the snapshot moved on,
+    the change journal says which ids changed and only those records are
+    read back from the mapped snapshot and patched into the indexes; any
+    gap in the journal, a "full" entry or a hand edit of prompts.json falls
+    back to a full reload. Use counts are as of the last vault write.
+    """
     
-    if tag:
-        prompts = [p for p in prompts if tag.lower() in [t.lower() for t in p.get("tags", [])]]
+    def __init__(self):
+        self.prompts = {}
+        self._by_name = {}
+        self.generation = 0
+        self._journal_offset = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self.reload()
     
-    if search:
-        search_lower = search.lower()
-        prompts = [p for p in prompts if 
-                   search_lower in p["name"].lower() or 
-                   search_lower in p["content"].lower() or
-                   search_lower in p.get("description", "").lower()]
+    def reload(self):
+        """Rebuild the in-memory indexes from prompts.json."""
+        journal = VAULT_DIR / JOURNAL_FILENAME
+        self._journal_offset = journal.stat().st_size if journal.exists() else 0
+        self._signatures = self._current_signatures()
+        vault = load_vault()
+        self.generation = vault.get("generation", 0)
+        self.prompts = {p["id"]: p for p in vault["prompts"]}
+        self._by_name = {p["name"].lower(): p["id"] for p in vault["prompts"]}
     
-    return prompts
+    def _current_signatures(self):
+        return (_stat_signature(VAULT_DIR / SNAPSHOT_FILENAME), _stat_signature(VAULT_FILE))
+    
+    def _read_journal(self, generation):
+        """Journal entries after our generation up to `generation`, or None on a gap."""
+        journal = VAULT_DIR / JOURNAL_FILENAME
+        try:
+            with open(journal, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < self._journal_offset:
+                    return None  # journal was restarted
+                f.seek(self._journal_offset)
+                data = f.read()
+        except OSError:
+            return None
+        trace_count("bytes_read", len(data))
+        
+        entries, expected = [], self.generation + 1
+        consumed = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # partially written line
+            entry = json.loads(line)
+            if entry["generation"] > generation:
+                break
+            consumed += len(line)
+            if entry["generation"] < expected:
+                continue
+            if entry["generation"] != expected or entry.get("full"):
+                return None
+            entries.append(entry)
+            expected += 1
+        if expected != generation + 1:
+            return None
+        self._journal_offset += consumed
+        return entries
+    
+    def _apply(self, snapshot, entries):
+        """Patch the indexes with the records named by journal entries."""
+        for entry in entries:
+            for prompt_id in entry["deleted"]:
+                old = self.prompts.pop(prompt_id, None)
+                if old:
+                    self._by_name.pop(old["name"].lower(), None)
+            for prompt_id in entry["upserted"]:
+                i = snapshot.find_id(prompt_id)
+                if i is None:
+                    continue  # deleted again by a later write
+                prompt = snapshot.metadata(i)
+                prompt["content"] = snapshot.content(i)
+                old = self.prompts.get(prompt_id)
+                if old:
+                    self._by_name.pop(old["name"].lower(), None)
+                self.prompts[prompt_id] = prompt
+                self._by_name[prompt["name"].lower()] = prompt_id
+                trace_count("records_scanned")
+    
+    def poll(self):
+        """Pick up changes since the last poll. Returns True if anything changed."""
+        signatures = self._current_signatures()
+        if signatures == self._signatures:
+            return False
+        
+        snapshot_changed = signatures[0] != self._signatures[0]
+        if snapshot_changed and signatures[0] is not None:
+            try:
+                with VaultSnapshot() as snapshot:
+                    if snapshot.generation == self.generation:
+                        self._signatures = signatures
+                        return False
+                    entries = self._read_journal(snapshot.generation)
+                    if entries is not None:
+                        self._apply(snapshot, entries)
+                        self.generation = snapshot.generation
+                        self._signatures = signatures
+                        return True
+            except (OSError, ValueError):
+                pass
+        
+        self.reload()
+        return True
+    
+    def get(self, name_or_id):
+        """Get a prompt by name or ID from memory."""
+        prompt_id = self._by_name.get(name_or_id.lower(), name_or_id)
+        return self.prompts.get(prompt_id)
+    
+    def list(self, category=None, tag=None, search=None):
+        """Filter the in-memory prompts like list_prompts."""
+        return _filter_prompts(list(self.prompts.values()), category, tag, search)
+    
+    def start(self, interval=1.0, on_change=None):
+        """Poll in a background thread, calling on_change(watcher) after changes."""
+        if self._thread:
+            return
+        self._stop.clear()
+        
+        def loop():
+            while not self._stop.wait(interval):
+                if self.poll() and on_change:
+                    on_change(self)
+        
+        self._thread = threading.Thread(target=loop, name="prompt-vault-watcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the background polling thread."""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
 
 
-def delete_prompt(name_or_id):
-    """Delete a prompt."""
-    vault = load_vault()
+# ═══════════════════════════════════════════════════════════════════════════════
+# BATCH MODE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _tags_arg(value):
+    """Accept tags as a list or a comma-separated string."""
+    if value is None or isinstance(value, list):
+        return value
+    return [t.strip() for t in str(value).split(",") if t.strip()]
+
+
+BATCH_OPS = {
+    "add": lambda c: add_prompt(c["name"], c["content"], c.get("category", "general"),
+                                _tags_arg(c.get("tags")), c.get("description", "")),
+    "use": lambda c: use_prompt(c["name"], copy_to_clipboard=c.get("copy", False)),
+    "get": lambda c: get_prompt(c["name"]),
+    "update": lambda c: update_prompt(c["name"], c.get("content"), c.get("new_name"),
+                                      c.get("category"), _tags_arg(c.get("tags"))),
+    "delete": lambda c: delete_prompt(c["name"]),
+    "list": lambda c: list_prompts(c.get("category"), c.get("tag"), c.get("search"),
+                                   max_tokens=c.get("max_tokens")),
+    "search": lambda c: list_prompts(search=c["query"]),
+    "select": lambda c: select_prompts(c.get("budget"), c.get("max_tokens"),
+                                       c.get("category"), c.get("tag")),
+}
+
+
+def _is_int(value):
+    """True for ints other than bools."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_tags(value):
+    """True for a comma-separated tag string or a list of tag strings."""
+    return isinstance(value, str) or (isinstance(value, list)
+                                      and all(isinstance(t, str) for t in value))
+
+
+# Expected types of optional batch fields; checked before an op runs so a
+# bad value is rejected instead of being written into the vault
+BATCH_FIELD_CHECKS = {
+    "name": (lambda v: isinstance(v, str), "a string"),
+    "new_name": (lambda v: isinstance(v, str), "a string"),
+    "content": (lambda v: isinstance(v, str), "a string"),
+    "category": (lambda v: isinstance(v, str), "a string"),
+    "description": (lambda v: isinstance(v, str), "a string"),
+    "query": (lambda v: isinstance(v, str), "a string"),
+    "search": (lambda v: isinstance(v, str), "a string"),
+    "tag": (lambda v: isinstance(v, str), "a string"),
+    "tags": (_is_tags, "a list of strings or a comma-separated string"),
+    "max_tokens": (_is_int, "an integer"),
+    "budget": (_is_int, "an integer"),
+    "copy": (lambda v: isinstance(v, bool), "true or false"),
+}
+
+
+def _check_batch_fields(command):
+    """Return an error message for the first wrongly typed field, or None."""
+    for field, (check, expected) in BATCH_FIELD_CHECKS.items():
+        if command.get(field) is not None and not check(command[field]):
+            return f"invalid field: {field} must be {expected}"
+    return None
+
+
+def run_batch_command(command):
+    """Run one batch command dict and return its result dict."""
+    op = command.get("op") if isinstance(command, dict) else None
+    if not isinstance(op, str) or op not in BATCH_OPS:
+        return {"op": op, "ok": False, "error": f"unknown op: {op}"}
+    error = _check_batch_fields(command)
+    if error:
+        return {"op": op, "ok": False, "error": error}
     
-    for i, p in enumerate(vault["prompts"]):
-        if p["name"].lower() == name_or_id.lower() or p["id"] == name_or_id:
-            name = p["name"]
-            del vault["prompts"][i]
-            save_vault(vault)
-            print(f"✓ Deleted prompt '{name}'")
-            return True
+    out = StringIO()
+    try:
+        with redirect_stdout(out):
+            value = BATCH_OPS[op](command)
+    except KeyError as e:
+        return {"op": op, "ok": False, "error": f"missing field: {e.args[0]}"}
+    except Exception as e:
+        # A bad command must not end the batch: report it and carry on
+        return {"op": op, "ok": False, "error": f"{type(e).__name__}: {e}"}
     
-    print(f"✗ Prompt '{name_or_id}' not found")
-    return False
+    result = {"op": op, "ok": value is not None and value is not False}
+    if value is not None and not isinstance(value, bool):
+        result["result"] = value
+    message = out.getvalue().strip()
+    if message:
+        result["message"] = message
+    elif value is None:
+        result["error"] = f"prompt '{command.get('name')}' not found"
+    return result
 
 
-def update_prompt(name_or_id, new_content=None, new_name=None, new_category=None, new_tags=None):
-    """Update an existing prompt."""
-    vault = load_vault()
+def run_batch(lines, output=None, commit_every=0):
+    """Run JSONL batch commands against one in-memory vault.
     
-    for i, p in enumerate(vault["prompts"]):
-        if p["name"].lower() == name_or_id.lower() or p["id"] == name_or_id:
-            if new_content:
-                vault["prompts"][i]["content"] = new_content
-            if new_name:
-                vault["prompts"][i]["name"] = new_name
-            if new_category:
-                vault["prompts"][i]["category"] = new_category
-            if new_tags is not None:
-                vault["prompts"][i]["tags"] = new_tags
-            
-            vault["prompts"][i]["updated"] = datetime.now().isoformat()
+    Writes one JSON result line per command to `output` (stdout by default)
+    and commits once at the end, or after every `commit_every` commands.
+    Returns the number of commands that failed.
+    """
+    output = output or sys.stdout
+    failed = 0
+    with vault_session() as commit:
+        count = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            count += 1
+            try:
+                result = run_batch_command(json.loads(line))
+            except json.JSONDecodeError as e:
+                result = {"op": None, "ok": False, "error": f"invalid JSON: {e}"}
+            result["index"] = count
+            failed += not result["ok"]
+            output.write(json.dumps(result, default=_json_default) + "\n")
+            if commit_every and count % commit_every == 0:
+                commit()
+    return failed
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SIZE METADATA
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _heuristic_tokens(content):
+    """Offline token estimate: ~4 characters or ~0.75 words per token."""
+    return max(-(-len(content) // 4), -(-len(content.split()) * 4 // 3))
+
+
+TOKEN_ESTIMATORS = {"heuristic": _heuristic_tokens}
+
+
+def register_token_estimator(name, func, default=False):
+    """Register func(content) -> int as a token estimator, optionally as the default.
+    
+    Records sized by a different estimator are recomputed on the next write.
+    """
+    global TOKEN_ESTIMATOR
+    TOKEN_ESTIMATORS[name] = func
+    if default:
+        TOKEN_ESTIMATOR = name
+
+
+def prompt_size(content):
+    """Size metadata for prompt content."""
+    return {
+        "chars": len(content),
+        "words": len(content.split()),
+        "tokens": int(TOKEN_ESTIMATORS[TOKEN_ESTIMATOR](content)),
+        "estimator": TOKEN_ESTIMATOR,
+    }
+
+
+def _size_is_stale(prompt):
+    """True if a record's stored size is missing or out of date."""
+    size = prompt.get("size")
+    return (not size or size.get("estimator") != TOKEN_ESTIMATOR
+            or ("content" in prompt and size.get("chars") != len(prompt["content"])))
+
+
+def _stored_size(prompt):
+    """Stored size metadata, computed on the fly for records that lack it."""
+    return prompt_size(prompt["content"]) if _size_is_stale(prompt) else prompt["size"]
+
+
+def _size_metadata(prompts):
+    """Metadata dicts (without content) carrying up-to-date size metadata."""
+    result = []
+    for p in prompts:
+        meta = {k: v for k, v in p.items() if k != "content"}
+        meta["size"] = _stored_size(p)
+        result.append(meta)
+    return result
+
+
+def select_prompts(budget=None, max_tokens=None, category=None, tag=None):
+    """Choose prompts by stored size without reading their bodies.
+    
+    Reads only record metadata from the vault snapshot and installed packs.
+    Prompts over `max_tokens` are dropped; with a `budget`, the most used
+    prompts are taken greedily while their total tokens fit. Returns
+    metadata dicts (no content), most used first.
+    """
+    if _session is not None:
+        # Batch session: the in-memory vault is newer than the snapshot
+        candidates = _size_metadata(_session["vault"]["prompts"])
+    else:
+        snapshot = open_snapshot()
+        try:
+            candidates = [snapshot.metadata(i) for i in range(len(snapshot))]
+        finally:
+            snapshot.close()
+        if any(_size_is_stale(p) for p in candidates):
+            # Vault predates size metadata: backfill it once for later calls
+            vault = load_vault()
             save_vault(vault)
-            print(f"✓ Updated prompt '{p['name']}'")
-            return True
+            candidates = _size_metadata(vault["prompts"])
+    
+    # Same name-and-id overrides as list_prompts, so copy-on-write edits hide the pack original
+    candidates += load_pack_prompts(exclude=candidates, content=False)
     
-    print(f"✗ Prompt '{name_or_id}' not found")
-    return False
+    usage = load_usage()
+    for p in candidates:
+        if p["id"] in usage:
+            p["uses"] = usage[p["id"]]["uses"]
+    
+    limit = min(x for x in (budget, max_tokens, float("inf")) if x is not None)
+    chosen, total = [], 0
+    for p in sorted(candidates, key=lambda x: (-x.get("uses", 0), x["size"]["tokens"])):
+        if category and p["category"].lower() != category.lower():
+            continue
+        if tag and tag.lower() not in [t.lower() for t in p.get("tags", [])]:
+            continue
+        tokens = p["size"]["tokens"]
+        if tokens > limit or (budget is not None and total + tokens > budget):
+            continue
+        chosen.append(p)
+        total += tokens
+    return chosen
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -235,7 +2201,7 @@ def export_prompts(filepath, category=None):
         "prompts": prompts
     }
     
-    Path(filepath).write_text(json.dumps(export_data, indent=2))
+    Path(filepath).write_text(json.dumps(export_data, indent=2, default=_json_default))
     print(f"✓ Exported {len(prompts)} prompts to {filepath}")
     return True
 
@@ -282,11 +2248,194 @@ def import_prompts(filepath, overwrite=False):
         return False
 
 
+def parse_front_matter(text):
+    """Split a `---` delimited front matter block from a prompt file.
+    
+    Supports the simple YAML subset prompt files use: `key: value`, inline
+    lists (`tags: [a, b]`) and block lists (`- item`). Returns (meta, body).
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines or lines[0].strip() != "---":
+        return {}, text
+    
+    meta, key = {}, None
+    for i, line in enumerate(lines[1:], start=1):
+        stripped = line.strip()
+        if stripped in ("---", "..."):
+            return meta, "".join(lines[i + 1:]).lstrip("\n")
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and key:
+            if not isinstance(meta[key], list):
+                meta[key] = []
+            meta[key].append(_unquote(stripped[2:]))
+        elif ":" in stripped:
+            key, value = stripped.split(":", 1)
+            key, value = key.strip().lower(), value.strip()
+            if value.startswith("[") and value.endswith("]"):
+                meta[key] = [_unquote(v) for v in value[1:-1].split(",") if v.strip()]
+            else:
+                meta[key] = _unquote(value)
+        else:
+            raise ValueError(f"line {i + 1}: cannot parse front matter: {stripped}")
+    raise ValueError("front matter is not closed with '---'")
+
+
+def _unquote(value):
+    """Strip whitespace and matching quotes from a front matter value."""
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    return value
+
+
+def _parse_prompt_file(path):
+    """Parse one prompt file. Runs in worker processes; returns (path, prompt, error)."""
+    try:
+        meta, body = parse_front_matter(Path(path).read_text(encoding="utf-8"))
+        content = body.strip()
+        if not content:
+            raise ValueError("empty prompt content")
+        tags = meta.get("tags", [])
+        if isinstance(tags, str):
+            tags = [t.strip() for t in tags.split(",") if t.strip()]
+        return path, {
+            "name": meta.get("name") or meta.get("title") or Path(path).stem,
+            "content": content,
+            "category": meta.get("category") or "general",
+            "tags": tags,
+            "description": meta.get("description", ""),
+        }, None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def _find_prompt_files(root):
+    """Sorted prompt files under root, skipping hidden directories."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        files.extend(os.path.join(dirpath, f) for f in sorted(filenames)
+                     if f.lower().endswith(IMPORT_EXTENSIONS))
+    return files
+
+
+def parse_workers(value):
+    """Parse a worker count argument (at least 1)."""
+    try:
+        workers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid worker count: {value}")
+    if workers < 1:
+        raise argparse.ArgumentTypeError("workers must be at least 1")
+    return workers
+
+
+def import_directory(path, overwrite=False, workers=None, progress=True):
+    """Import a tree of Markdown/text prompt files in a single vault write.
+    
+    Files are parsed in a process pool; front matter supplies name,
+    category, tags and description, and the body becomes the content.
+    Unparseable files are reported in the returned summary's "errors" list
+    instead of aborting the import.
+    """
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be at least 1")
+    files = _find_prompt_files(path)
+    total = len(files)
+    
+    def report(done):
+        if progress and total:
+            print(f"\r  Parsed {done}/{total} files", end="" if done < total else "\n",
+                  file=sys.stderr, flush=True)
+    
+    results = []
+    with trace_phase("import_dir.parse"):
+        if total < PARALLEL_IMPORT_THRESHOLD or workers == 1:
+            for done, f in enumerate(files, start=1):
+                results.append(_parse_prompt_file(f))
+                if done % 100 == 0 or done == total:
+                    report(done)
+        else:
+            # Imported here: multiprocessing is slow to import and only import-dir needs it
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, total // ((workers or os.cpu_count() or 1) * 8))
+                for done, result in enumerate(pool.map(_parse_prompt_file, files, chunksize=chunksize),
+                                              start=1):
+                    results.append(result)
+                    if done % 500 == 0 or done == total:
+                        report(done)
+    
+    summary = {"imported": 0, "updated": 0, "skipped": 0, "errors": []}
+    vault = load_vault()
+    prompts = vault["prompts"]
+    by_name = {p["name"].lower(): p for p in prompts}
+    ids = {p["id"] for p in prompts}
+    archived = {e["name"].lower() for e in _load_archive_index()["entries"].values()}
+    packed = {n.lower() for _, snapshot in _packs() for n in snapshot.names()}
+    
+    with trace_phase("import_dir.merge"):
+        for file, prompt, error in results:
+            if error:
+                summary["errors"].append({"file": file, "error": error})
+                continue
+            existing = by_name.get(prompt["name"].lower())
+            if existing is None and prompt["name"].lower() in archived:
+                if not overwrite:
+                    summary["skipped"] += 1
+                    continue
+                # Bring the archived prompt back so it is updated, not duplicated
+                existing = prompts[promote_archived(vault, prompt["name"])]
+                archived.discard(prompt["name"].lower())
+                by_name[prompt["name"].lower()] = existing
+                ids.add(existing["id"])
+            elif existing is None and prompt["name"].lower() in packed:
+                if not overwrite:
+                    summary["skipped"] += 1
+                    continue
+                # Copy-on-write override of the pack prompt, as update does
+                existing = prompts[copy_pack_prompt(vault, prompt["name"])]
+                by_name[prompt["name"].lower()] = existing
+                ids.add(existing["id"])
+            if existing and not overwrite:
+                summary["skipped"] += 1
+            elif existing:
+                if prompt["content"] != existing["content"]:
+                    record_revision(existing["id"], prompt["content"], previous=existing["content"])
+                existing.update(prompt)
+                existing["size"] = prompt_size(prompt["content"])
+                existing["updated"] = datetime.now().isoformat()
+                _mark_changed(existing["id"])
+                summary["updated"] += 1
+            else:
+                new = _new_prompt(**prompt)
+                while new["id"] in ids:
+                    new["id"] = generate_id(new["id"] + file)
+                ids.add(new["id"])
+                prompts.append(new)
+                by_name[new["name"].lower()] = new
+                _mark_changed(new["id"])
+                summary["imported"] += 1
+    
+    if summary["imported"] or summary["updated"]:
+        save_vault(vault)
+    
+    print(f"✓ Imported {summary['imported']} prompts from {total} files "
+          f"({summary['updated']} updated, {summary['skipped']} skipped, "
+          f"{len(summary['errors'])} errors)")
+    for e in summary["errors"][:10]:
+        print(f"  ✗ {e['file']}: {e['error']}")
+    if len(summary["errors"]) > 10:
+        print(f"  ... and {len(summary['errors']) - 10} more")
+    return summary
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # CLI INTERFACE
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def print_prompt_table(prompts):
+def print_prompt_table(prompts, sort="uses"):
     """Print prompts in a nice table format."""
     if not prompts:
         print("No prompts found.")
@@ -296,7 +2445,16 @@ def print_prompt_table(prompts):
     print(f"\n{'ID':<10} {'Name':<25} {'Category':<15} {'Uses':<6} {'Tags'}")
     print("─" * 80)
     
-    for p in sorted(prompts, key=lambda x: x.get("uses", 0), reverse=True):
+    if sort == "hot":
+        usage = load_usage()
+        now = time.time()
+        key = lambda x: hotness(usage[x["id"]], now) if x["id"] in usage else 0.0
+    elif sort == "name":
+        key = lambda x: x["name"].lower()
+    else:
+        key = lambda x: x.get("uses", 0)
+    
+    for p in sorted(prompts, key=key, reverse=sort != "name"):
         tags = ", ".join(p.get("tags", [])[:3])
         if len(p.get("tags", [])) > 3:
             tags += "..."
@@ -314,8 +2472,14 @@ def print_prompt_detail(prompt):
     print(f"  Category: {prompt['category']}")
     print(f"  Tags:     {', '.join(prompt.get('tags', [])) or 'none'}")
     print(f"  Uses:     {prompt.get('uses', 0)}")
+    size = _stored_size(prompt)
+    print(f"  Size:     {size['chars']} chars, {size['words']} words, ~{size['tokens']} tokens")
     print(f"  Created:  {prompt['created'][:10]}")
     print(f"  Updated:  {prompt['updated'][:10]}")
+    if prompt.get('pack'):
+        print(f"  Pack:     {prompt['pack']}")
+    if prompt.get('archived'):
+        print(f"  Status:   archived (promoted back on next use)")
     if prompt.get('description'):
         print(f"  Desc:     {prompt['description']}")
     print(f"{'─' * 60}")
@@ -360,6 +2524,7 @@ def interactive_add():
 
 def main():
     """Main CLI entry point."""
+    main_start = time.perf_counter()
     parser = argparse.ArgumentParser(
         description="AI Prompt Vault - Save, organize, and reuse your best AI prompts",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -374,6 +2539,9 @@ Examples:
         """
     )
     
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Print phase timings and I/O counters to stderr (see also ${TRACE_ENV_VAR})")
+    
     subparsers = parser.add_subparsers(dest="command", help="Commands")
     
     # Init command
@@ -401,10 +2569,15 @@ Examples:
     list_parser = subparsers.add_parser("list", help="List prompts")
     list_parser.add_argument("-c", "--category", help="Filter by category")
     list_parser.add_argument("-t", "--tag", help="Filter by tag")
+    list_parser.add_argument("-s", "--sort", choices=["uses", "hot", "name"], default="uses",
+                             help="Sort order (hot = recently used, decayed)")
+    list_parser.add_argument("--max-tokens", type=int, metavar="N",
+                             help="Only prompts estimated at N tokens or fewer")
     
     # Search command
     search_parser = subparsers.add_parser("search", help="Search prompts")
     search_parser.add_argument("query", help="Search query")
+    search_parser.add_argument("--all", action="store_true", help="Also search archived prompts")
     
     # Delete command
     delete_parser = subparsers.add_parser("delete", help="Delete a prompt")
@@ -419,6 +2592,19 @@ Examples:
     update_parser.add_argument("-n", "--new-name", help="New name")
     update_parser.add_argument("-f", "--file", help="Read new content from file")
     
+    # History commands
+    history_parser = subparsers.add_parser("history", help="Show a prompt's revision history")
+    history_parser.add_argument("name", help="Prompt name or ID")
+    
+    diff_parser = subparsers.add_parser("diff", help="Diff two revisions of a prompt")
+    diff_parser.add_argument("name", help="Prompt name or ID")
+    diff_parser.add_argument("rev1", type=parse_revision, help="Old revision (e.g. r1)")
+    diff_parser.add_argument("rev2", type=parse_revision, help="New revision (e.g. r2)")
+    
+    revert_parser = subparsers.add_parser("revert", help="Revert a prompt to an earlier revision")
+    revert_parser.add_argument("name", help="Prompt name or ID")
+    revert_parser.add_argument("rev", type=parse_revision, help="Revision to restore (e.g. r3)")
+    
     # Export command
     export_parser = subparsers.add_parser("export", help="Export prompts")
     export_parser.add_argument("file", help="Output file path")
@@ -429,17 +2615,74 @@ Examples:
     import_parser.add_argument("file", help="Input file path")
     import_parser.add_argument("--overwrite", action="store_true", help="Overwrite existing")
     
+    # Pack commands
+    pack_parser = subparsers.add_parser("pack", help="Manage read-only prompt packs")
+    pack_sub = pack_parser.add_subparsers(dest="pack_command")
+    pack_install = pack_sub.add_parser("install", help="Install or update a pack from a JSON file")
+    pack_install.add_argument("file", help="Pack file (same format as import)")
+    pack_install.add_argument("-n", "--name", help="Pack name (default: file name)")
+    pack_remove = pack_sub.add_parser("remove", help="Uninstall a pack")
+    pack_remove.add_argument("name", help="Pack name")
+    pack_sub.add_parser("list", help="List installed packs")
+    
+    # Archive command
+    archive_parser = subparsers.add_parser("archive", help="Move long-unused prompts to the cold archive")
+    archive_parser.add_argument("--unused-for", type=parse_days, required=True, metavar="AGE",
+                                help="Archive prompts not used or edited for this long (e.g. 180d)")
+    archive_parser.add_argument("--dry-run", action="store_true", help="Only list what would move")
+    
+    # Batch command
+    batch_parser = subparsers.add_parser("batch", help="Run JSONL commands in one process")
+    batch_parser.add_argument("file", nargs="?", default="-", help="Command file (default: stdin)")
+    batch_parser.add_argument("--commit-every", type=int, default=0, metavar="N",
+                              help="Write the vault every N commands (default: once at end)")
+    
+    # Completion command
+    completion_parser = subparsers.add_parser("completion", help="Print a shell completion script")
+    completion_parser.add_argument("shell", choices=["bash", "zsh", "fish"], help="Target shell")
+    
+    # Import-dir command
+    import_dir_parser = subparsers.add_parser("import-dir", help="Import a directory of .md/.txt prompts")
+    import_dir_parser.add_argument("path", help="Directory to scan")
+    import_dir_parser.add_argument("--overwrite", action="store_true", help="Overwrite existing")
+    import_dir_parser.add_argument("-j", "--workers", type=parse_workers, help="Parser processes (default: CPU count)")
+    import_dir_parser.add_argument("--errors", metavar="FILE", help="Write a JSON report of failed files")
+    import_dir_parser.add_argument("-q", "--quiet", action="store_true", help="No progress output")
+    
     # Categories command
     subparsers.add_parser("categories", help="List categories")
     
     # Stats command
-    subparsers.add_parser("stats", help="Show vault statistics")
+    stats_parser = subparsers.add_parser("stats", help="Show vault statistics")
+    stats_parser.add_argument("-w", "--window", type=parse_window,
+                              help="Also report uses in a recent window (e.g. 7d)")
     
     # Interactive command
     subparsers.add_parser("interactive", help="Interactive mode")
     
+    parser.set_defaults(commands=list(subparsers.choices))
     args = parser.parse_args()
     
+    trace_dest = trace_destination(args.profile)
+    collector = None
+    if trace_dest:
+        collector = add_trace_hook(TraceCollector())
+        collector("phase", "import", main_start - _IMPORT_START)
+        collector("phase", "argparse", time.perf_counter() - main_start)
+    
+    try:
+        with trace_phase("operation"):
+            run_command(args, parser)
+    finally:
+        if collector:
+            remove_trace_hook(collector)
+            record = {"command": args.command, **collector.as_dict()}
+            record["phases"]["total"] = round(time.perf_counter() - _IMPORT_START, 6)
+            write_trace(record, trace_dest)
+
+
+def run_command(args, parser):
+    """Execute a parsed CLI command."""
     # Initialize vault on first run
     if not VAULT_DIR.exists():
         init_vault()
@@ -472,11 +2715,11 @@ Examples:
             print(f"✗ Prompt '{args.name}' not found")
             
     elif args.command == "list":
-        prompts = list_prompts(category=args.category, tag=args.tag)
-        print_prompt_table(prompts)
+        prompts = list_prompts(category=args.category, tag=args.tag, max_tokens=args.max_tokens)
+        print_prompt_table(prompts, sort=args.sort)
         
     elif args.command == "search":
-        prompts = list_prompts(search=args.query)
+        prompts = list_prompts(search=args.query, include_archived=args.all)
         print_prompt_table(prompts)
         
     elif args.command == "delete":
@@ -494,12 +2737,70 @@ Examples:
         new_tags = [t.strip() for t in args.tags.split(",")] if args.tags else None
         update_prompt(args.name, new_content, args.new_name, args.category, new_tags)
         
+    elif args.command == "history":
+        history = get_history(args.name)
+        if history is None:
+            print(f"✗ Prompt '{args.name}' not found")
+        else:
+            print(f"\n{'Rev':<6} {'Date':<20} {'Stored':<8} {'Chars'}")
+            print("─" * 44)
+            for h in history:
+                print(f"r{h['rev']:<5} {h['timestamp'][:19]:<20} {h['kind']:<8} {h['size']}")
+            
+    elif args.command == "diff":
+        diff = diff_revisions(args.name, args.rev1, args.rev2)
+        if diff is None:
+            print(f"✗ Revisions r{args.rev1}/r{args.rev2} of '{args.name}' not found")
+        else:
+            print(diff or "(no differences)")
+            
+    elif args.command == "revert":
+        revert_prompt(args.name, args.rev)
+        
     elif args.command == "export":
         export_prompts(args.file, args.category)
         
     elif args.command == "import":
         import_prompts(args.file, args.overwrite)
         
+    elif args.command == "pack":
+        if args.pack_command == "install":
+            install_pack(args.file, args.name)
+        elif args.pack_command == "remove":
+            remove_pack(args.name)
+        else:
+            packs = list_packs()
+            if not packs:
+                print("No packs installed.")
+            for pack, count in packs:
+                print(f"  • {pack} ({count} prompts)")
+        
+    elif args.command == "archive":
+        archive_prompts(args.unused_for, args.dry_run)
+        
+    elif args.command == "batch":
+        if args.file == "-":
+            failed = run_batch(sys.stdin, commit_every=args.commit_every)
+        else:
+            with open(args.file, encoding="utf-8") as f:
+                failed = run_batch(f, commit_every=args.commit_every)
+        if failed:
+            sys.exit(1)
+        
+    elif args.command == "completion":
+        # Make sure the cache exists for vaults written before it did
+        _refresh_name_cache()
+        print(completion_script(args.shell, args.commands), end="")
+        
+    elif args.command == "import-dir":
+        if not Path(args.path).is_dir():
+            print(f"✗ Not a directory: {args.path}")
+            sys.exit(1)
+        summary = import_directory(args.path, args.overwrite, args.workers, not args.quiet)
+        if args.errors:
+            Path(args.errors).write_text(json.dumps(summary["errors"], indent=2))
+            print(f"  Error report written to {args.errors}")
+        
     elif args.command == "categories":
         config = load_config()
         print("\nCategories:")
@@ -514,10 +2815,33 @@ Examples:
         print("─" * 40)
         print(f"  Total prompts:  {len(prompts)}")
         print(f"  Total uses:     {sum(p.get('uses', 0) for p in prompts)}")
+        archived = len(_load_archive_index()["entries"])
+        if archived:
+            print(f"  Archived:       {archived}")
+        packs = list_packs()
+        if packs:
+            print(f"  Pack prompts:   {sum(c for _, c in packs)} ({len(packs)} packs)")
+        if QUERY_CACHE_ENABLED:
+            cache = get_query_cache().stats()
+            print(f"  Query cache:    {cache['hits']} hits, {cache['misses']} misses "
+                  f"({cache['entries']} entries)")
         if prompts:
             most_used = max(prompts, key=lambda x: x.get('uses', 0))
             print(f"  Most used:      {most_used['name']} ({most_used.get('uses', 0)} uses)")
             
+            usage = load_usage()
+            now = time.time()
+            used = [p for p in prompts if p["id"] in usage]
+            if used:
+                hottest = max(used, key=lambda x: hotness(usage[x["id"]], now))
+                print(f"  Hottest:        {hottest['name']} ({hotness(usage[hottest['id']], now):.2f})")
+            if args.window:
+                recent = {p["name"]: uses_in_window(usage[p["id"]], args.window, now) for p in used}
+                print(f"  {f'Uses ({args.window}d):':<16}{sum(recent.values())}")
+                if recent and max(recent.values()) > 0:
+                    top = max(recent, key=recent.get)
+                    print(f"  {f'Top ({args.window}d):':<16}{top} ({recent[top]} uses)")
+            
             # Category breakdown
             categories = {}
             for p in prompts:
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+AI Prompt Vault - Shell Completion Helper
+=========================================
+Answers prompt-name prefix queries for shell completion.
+
+Deliberately standalone: it never imports prompt_vault and only reads the
+sorted, newline-delimited name cache (~/.prompt-vault/names.txt) that every
+vault mutation rewrites. Lookups are a binary search over a memory-mapped
+file, so they stay in the low milliseconds even for very large vaults.
+
+Usage:
+    python prompt_vault_complete.py [--cache PATH] [--limit N] PREFIX
+
+Author: Randell Logan Smith (DonkRonk17)
+License: MIT
+"""
+
+import mmap
+import os
+import sys
+
+DEFAULT_CACHE = os.path.join(os.path.expanduser("~"), ".prompt-vault", "names.txt")
+DEFAULT_LIMIT = 200
+
+
+def _line_bounds(mm, pos):
+    """Return (start, end) of the line containing byte offset `pos`."""
+    start = mm.rfind(b"\n", 0, pos) + 1
+    end = mm.find(b"\n", start)
+    return start, len(mm) if end < 0 else end
+
+
+def complete(prefix, cache=DEFAULT_CACHE, limit=DEFAULT_LIMIT):
+    """Return up to `limit` cached names starting with `prefix`."""
+    needle = prefix.encode("utf-8")
+    try:
+        with open(cache, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Missing or empty cache: nothing to complete
+        return []
+
+    with mm:
+        # Find the first line >= prefix; lines before `lo` sort below it
+        lo, hi = 0, len(mm)
+        while lo < hi:
+            start, end = _line_bounds(mm, (lo + hi) // 2)
+            if mm[start:end] < needle:
+                lo = end + 1
+            else:
+                hi = start
+
+        matches = []
+        while lo < len(mm) and len(matches) < limit:
+            start, end = _line_bounds(mm, lo)
+            line = mm[start:end]
+            if not line.startswith(needle):
+                break
+            matches.append(line.decode("utf-8", errors="replace"))
+            lo = end + 1
+        return matches
+
+
+def main(argv=None):
+    """CLI entry point: print matching names, one per line."""
+    args = list(sys.argv[1:] if argv is None else argv)
+    cache, limit = DEFAULT_CACHE, DEFAULT_LIMIT
+    while len(args) > 1 and args[0] in ("--cache", "--limit"):
+        if args[0] == "--cache":
+            cache = args[1]
+        else:
+            limit = int(args[1])
+        args = args[2:]
+    prefix = args[0] if args else ""
+
+    out = "\n".join(complete(prefix, cache, limit))
+    if out:
+        sys.stdout.write(out + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
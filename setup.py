@@ -7,7 +7,7 @@ setup(
     author="Randell Logan Smith",
     author_email="logan@metaphysicsandcomputing.com",
     url="https://github.com/DonkRonk17/ai-prompt-vault",
-    py_modules=["prompt_vault"],
+    py_modules=["prompt_vault", "prompt_vault_complete"],
     entry_points={
         "console_scripts": [
             "prompt-vault=prompt_vault:main",
@@ -20,6 +20,7 @@ from datetime import datetime
 sys.path.insert(0, str(Path(__file__).parent))
 
 import prompt_vault
+import prompt_vault_complete
 
 
 class TestVaultOperations(unittest.TestCase):
@@ -373,6 +374,1277 @@ class TestUtilityFunctions(unittest.TestCase):
         self.assertEqual(len(id), 8)
 
 
+class TestRevisionHistory(unittest.TestCase):
+    """Test delta-compressed revision history."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_28_update_records_revisions(self):
+        """Test that content updates are recorded as revisions."""
+        prompt_vault.add_prompt("hist", "line one\nline two\n")
+        prompt_vault.update_prompt("hist", new_content="line one\nline 2\n")
+        
+        history = prompt_vault.get_history("hist")
+        self.assertEqual([h["rev"] for h in history], [1, 2])
+        self.assertEqual(history[0]["kind"], "full")
+        self.assertEqual(history[1]["kind"], "delta")
+        self.assertEqual(prompt_vault.get_revision("hist", 1), "line one\nline two\n")
+        self.assertEqual(prompt_vault.get_revision("hist", 2), "line one\nline 2\n")
+    
+    def test_29_reconstruct_across_snapshots(self):
+        """Test that every revision survives many edits and snapshots."""
+        prompt_vault.add_prompt("many", "v0\n")
+        for i in range(1, 50):
+            prompt_vault.update_prompt("many", new_content=f"header\nv{i}\nfooter\n")
+        
+        history = prompt_vault.get_history("many")
+        self.assertEqual(len(history), 50)
+        self.assertEqual(history[prompt_vault.SNAPSHOT_INTERVAL]["kind"], "full")
+        self.assertEqual(prompt_vault.get_revision("many", 1), "v0\n")
+        self.assertEqual(prompt_vault.get_revision("many", 37), "header\nv36\nfooter\n")
+        self.assertEqual(prompt_vault.get_revision("many", 50), "header\nv49\nfooter\n")
+    
+    def test_30_diff_and_revert(self):
+        """Test diffing revisions and reverting to an earlier one."""
+        prompt_vault.add_prompt("rev", "original\n")
+        prompt_vault.update_prompt("rev", new_content="changed\n")
+        
+        diff = prompt_vault.diff_revisions("rev", 1, 2)
+        self.assertIn("-original", diff)
+        self.assertIn("+changed", diff)
+        
+        self.assertTrue(prompt_vault.revert_prompt("rev", 1))
+        self.assertEqual(prompt_vault.get_prompt("rev")["content"], "original\n")
+        self.assertEqual(len(prompt_vault.get_history("rev")), 3)
+    
+    def test_31_history_for_legacy_prompt(self):
+        """Test that prompts without history get a baseline on first update."""
+        vault = prompt_vault.load_vault()
+        vault["prompts"].append({
+            "id": "legacy01", "name": "legacy", "content": "old",
+            "category": "general", "tags": [], "description": "",
+            "created": "2024-01-01T00:00:00", "updated": "2024-01-01T00:00:00",
+            "uses": 0
+        })
+        prompt_vault.save_vault(vault)
+        
+        prompt_vault.update_prompt("legacy", new_content="new")
+        self.assertEqual(prompt_vault.get_revision("legacy", 1), "old")
+        self.assertEqual(prompt_vault.get_revision("legacy", 2), "new")
+
+
+
+class TestUsageAnalytics(unittest.TestCase):
+    """Test rolling usage counters and hotness."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_32_use_does_not_rewrite_vault(self):
+        """Test that recording a use leaves prompts.json untouched."""
+        prompt_vault.add_prompt("quiet", "Content")
+        before = self.vault_file.read_bytes()
+        
+        prompt_vault.use_prompt("quiet", copy_to_clipboard=False)
+        prompt_vault.use_prompt("quiet", copy_to_clipboard=False)
+        
+        self.assertEqual(self.vault_file.read_bytes(), before)
+        self.assertEqual(prompt_vault.get_prompt("quiet")["uses"], 2)
+    
+    def test_33_window_counts_roll_over(self):
+        """Test that daily buckets roll and expire with the window."""
+        day = 86400
+        start = 20000 * day
+        prompt_vault.record_use("abcd1234", now=start)
+        prompt_vault.record_use("abcd1234", now=start + 3 * day)
+        prompt_vault.record_use("abcd1234", now=start + 3 * day)
+        
+        record = prompt_vault.load_usage()["abcd1234"]
+        self.assertEqual(record["uses"], 3)
+        self.assertEqual(prompt_vault.uses_in_window(record, 1, now=start + 3 * day), 2)
+        self.assertEqual(prompt_vault.uses_in_window(record, 7, now=start + 3 * day), 3)
+        self.assertEqual(prompt_vault.uses_in_window(record, 7, now=start + 12 * day), 0)
+        
+        # A use after the whole window has passed clears old buckets
+        later = start + (prompt_vault.USAGE_WINDOW_DAYS + 5) * day
+        prompt_vault.record_use("abcd1234", now=later)
+        record = prompt_vault.load_usage()["abcd1234"]
+        self.assertEqual(sum(record["counts"]), 1)
+        self.assertEqual(record["uses"], 4)
+    
+    def test_34_hotness_decays(self):
+        """Test that recent uses outrank older, more frequent ones."""
+        day = 86400
+        now = 20000 * day
+        for _ in range(5):
+            prompt_vault.record_use("old00000", now=now - 60 * day)
+        prompt_vault.record_use("new00000", now=now - day)
+        
+        usage = prompt_vault.load_usage()
+        self.assertGreater(prompt_vault.hotness(usage["new00000"], now),
+                           prompt_vault.hotness(usage["old00000"], now))
+        self.assertAlmostEqual(
+            prompt_vault.hotness(usage["new00000"], now - day + prompt_vault.HOT_HALF_LIFE_DAYS * day),
+            0.5)
+    
+    def test_68_long_and_unicode_ids(self):
+        """Test that ids longer than 8 bytes or non-ASCII keep one usage record."""
+        vault = prompt_vault.load_vault()
+        vault["prompts"].append(prompt_vault._new_prompt("long", "x", "general", [], ""))
+        vault["prompts"][0]["id"] = "imported-prompt-0001"
+        prompt_vault.save_vault(vault)
+        
+        prompt_vault._usage_slots.clear()
+        prompt_vault.use_prompt("long", copy_to_clipboard=False)
+        prompt_vault._usage_slots.clear()
+        prompt_vault.use_prompt("long", copy_to_clipboard=False)
+        self.assertEqual(prompt_vault.get_prompt("long")["uses"], 2)
+        self.assertEqual((self.vault_dir / prompt_vault.USAGE_FILENAME).stat().st_size,
+                         prompt_vault._USAGE_RECORD_SIZE)
+        
+        self.assertEqual(prompt_vault.record_use("ключ-1"), 1)
+        self.assertEqual(prompt_vault.load_usage()["ключ-1"]["uses"], 1)
+        self.assertNotIn("imported", prompt_vault.load_usage())
+
+
+
+class TestTracing(unittest.TestCase):
+    """Test the profiling/trace hook API."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_35_hooks_collect_phases_and_counters(self):
+        """Test that a collector sees load/save phases and I/O counters."""
+        prompt_vault.add_prompt("traced", "Content")
+        collector = prompt_vault.add_trace_hook(prompt_vault.TraceCollector())
+        try:
+            prompt_vault.update_prompt("traced", new_category="coding")
+        finally:
+            prompt_vault.remove_trace_hook(collector)
+        
+        metrics = collector.as_dict()
+        for phase in ("load_vault.read", "load_vault.parse",
+                      "save_vault.serialize", "save_vault.write"):
+            self.assertIn(phase, metrics["phases"])
+        # prompts.json plus the derived files written alongside it
+        self.assertGreater(metrics["counters"]["bytes_written"], self.vault_file.stat().st_size)
+        self.assertEqual(metrics["counters"]["records_scanned"], 1)
+    
+    def test_36_removed_hook_sees_nothing(self):
+        """Test that removed hooks receive no further events."""
+        events = []
+        hook = prompt_vault.add_trace_hook(lambda *event: events.append(event))
+        prompt_vault.remove_trace_hook(hook)
+        prompt_vault.list_prompts()
+        self.assertEqual(events, [])
+    
+    def test_37_write_trace_appends_json_lines(self):
+        """Test that trace records are appended to a trace file."""
+        trace_file = Path(self.temp_dir) / "trace.jsonl"
+        prompt_vault.write_trace({"command": "list"}, str(trace_file))
+        prompt_vault.write_trace({"command": "get"}, str(trace_file))
+        lines = trace_file.read_text().splitlines()
+        self.assertEqual([json.loads(l)["command"] for l in lines], ["list", "get"])
+    
+    def test_79_trace_env_zero_is_off(self):
+        """Test that PROMPT_VAULT_TRACE="0" or "" disables tracing instead of naming a file."""
+        old = os.environ.get(prompt_vault.TRACE_ENV_VAR)
+        try:
+            for value, expected in (("0", None), ("", None), ("1", "1"), ("t.jsonl", "t.jsonl")):
+                os.environ[prompt_vault.TRACE_ENV_VAR] = value
+                self.assertEqual(prompt_vault.trace_destination(), expected)
+            os.environ[prompt_vault.TRACE_ENV_VAR] = "0"
+            self.assertEqual(prompt_vault.trace_destination(profile=True), "stderr")
+        finally:
+            if old is None:
+                os.environ.pop(prompt_vault.TRACE_ENV_VAR, None)
+            else:
+                os.environ[prompt_vault.TRACE_ENV_VAR] = old
+
+
+
+class TestShellCompletion(unittest.TestCase):
+    """Test the name cache and standalone completion helper."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_38_mutations_write_sorted_name_cache(self):
+        """Test that every mutation rewrites the sorted name cache."""
+        cache = self.vault_dir / prompt_vault.NAMES_FILENAME
+        prompt_vault.add_prompt("zeta", "Content")
+        prompt_vault.add_prompt("alpha", "Content")
+        self.assertEqual(cache.read_text().splitlines(), ["alpha", "zeta"])
+        
+        prompt_vault.update_prompt("zeta", new_name="beta")
+        prompt_vault.delete_prompt("alpha")
+        self.assertEqual(cache.read_text().splitlines(), ["beta"])
+    
+    def test_39_complete_prefix_queries(self):
+        """Test binary-search prefix completion over a large cache."""
+        names = [f"prompt-{i:05d}" for i in range(20000)] + ["code-review", "code-style", "debug"]
+        cache = Path(self.temp_dir) / "names.txt"
+        cache.write_bytes(b"\n".join(sorted(n.encode() for n in names)) + b"\n")
+        
+        self.assertEqual(prompt_vault_complete.complete("code", str(cache)),
+                         ["code-review", "code-style"])
+        self.assertEqual(prompt_vault_complete.complete("prompt-1999", str(cache)),
+                         [f"prompt-1999{i}" for i in range(10)])
+        self.assertEqual(prompt_vault_complete.complete("debug", str(cache)), ["debug"])
+        self.assertEqual(prompt_vault_complete.complete("zzz", str(cache)), [])
+        self.assertEqual(len(prompt_vault_complete.complete("", str(cache), limit=5)), 5)
+        self.assertEqual(prompt_vault_complete.complete("a", str(cache) + ".missing"), [])
+    
+    def test_40_completion_scripts(self):
+        """Test that completion scripts call the helper with the vault cache."""
+        for shell in ("bash", "zsh", "fish"):
+            script = prompt_vault.completion_script(shell, ["use", "get", "list"])
+            self.assertIn("prompt_vault_complete.py", script)
+            self.assertIn(prompt_vault.NAMES_FILENAME, script)
+        with self.assertRaises(ValueError):
+            prompt_vault.completion_script("tcsh", [])
+
+
+
+class TestBatchMode(unittest.TestCase):
+    """Test running many commands against one in-memory vault."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _run(self, commands, commit_every=0):
+        """Run commands through run_batch and return (results, vault writes)."""
+        from io import StringIO
+        writes = []
+        hook = prompt_vault.add_trace_hook(
+            lambda kind, name, value: writes.append(name) if name == "save_vault.write" else None)
+        out = StringIO()
+        try:
+            prompt_vault.run_batch([json.dumps(c) for c in commands], out, commit_every)
+        finally:
+            prompt_vault.remove_trace_hook(hook)
+        return [json.loads(l) for l in out.getvalue().splitlines()], len(writes)
+    
+    def test_41_batch_commits_once(self):
+        """Test that a batch applies all operations with a single write."""
+        results, writes = self._run([
+            {"op": "add", "name": "b1", "content": "one", "tags": ["x"]},
+            {"op": "add", "name": "b2", "content": "two", "category": "coding"},
+            {"op": "use", "name": "b1"},
+            {"op": "update", "name": "b2", "content": "TWO"},
+            {"op": "delete", "name": "b1"},
+        ])
+        self.assertTrue(all(r["ok"] for r in results))
+        self.assertEqual(results[2]["result"], "one")
+        self.assertEqual(writes, 1)
+        
+        vault = prompt_vault.load_vault()
+        self.assertEqual([p["name"] for p in vault["prompts"]], ["b2"])
+        self.assertEqual(vault["prompts"][0]["content"], "TWO")
+    
+    def test_42_batch_commit_every(self):
+        """Test periodic commits during a batch."""
+        commands = [{"op": "add", "name": f"p{i}", "content": f"c{i}"} for i in range(6)]
+        _, writes = self._run(commands, commit_every=2)
+        self.assertEqual(writes, 3)
+        self.assertEqual(len(prompt_vault.load_vault()["prompts"]), 6)
+    
+    def test_43_batch_errors_do_not_abort(self):
+        """Test that failing commands are reported and the rest still run."""
+        prompt_vault.add_prompt("dup", "Content")
+        results, _ = self._run([
+            {"op": "add", "name": "dup", "content": "again"},
+            {"op": "frobnicate"},
+            {"op": "get"},
+            {"op": "get", "name": "missing"},
+            {"op": "add", "name": "ok", "content": "fine"},
+        ])
+        self.assertEqual([r["ok"] for r in results], [False, False, False, False, True])
+        self.assertIn("already exists", results[0]["message"])
+        self.assertIn("missing field", results[2]["error"])
+        self.assertIsNotNone(prompt_vault.get_prompt("ok"))
+    
+    def test_69_batch_wrongly_typed_fields(self):
+        """Test that commands with wrongly typed fields fail without ending the batch."""
+        prompt_vault.add_prompt("typed", "Content")
+        results, _ = self._run([
+            {"op": "use", "name": 5},
+            {"op": ["use"]},
+            {"op": "add", "name": "ok", "content": "fine"},
+        ])
+        self.assertEqual(len(results), 3)
+        self.assertEqual([r["ok"] for r in results], [False, False, True])
+        self.assertIn("invalid field: name", results[0]["error"])
+        self.assertIsNotNone(prompt_vault.get_prompt("ok"))
+    
+    def test_80_bad_values_never_reach_the_vault(self):
+        """Test that wrongly typed values are rejected before they can be stored."""
+        prompt_vault.add_prompt("x", "Content")
+        results, _ = self._run([
+            {"op": "update", "name": "x", "new_name": 5},
+            {"op": "update", "name": "x", "category": ["coding"]},
+            {"op": "update", "name": "x", "tags": ["ok", 3]},
+            {"op": "update", "name": "x", "content": {"text": "hi"}},
+            {"op": "add", "name": "y", "content": "c", "description": 1},
+            {"op": "list", "max_tokens": "10"},
+            {"op": "update", "name": "x", "tags": "a,b"},
+        ])
+        self.assertEqual([r["ok"] for r in results], [False] * 6 + [True])
+        self.assertIn("invalid field: new_name", results[0]["error"])
+        
+        prompt = prompt_vault.get_prompt("x")
+        self.assertEqual((prompt["content"], prompt["category"], prompt["tags"]),
+                         ("Content", "general", ["a", "b"]))
+        self.assertIsNone(prompt_vault.get_prompt("y"))
+
+
+
+class TestSharedSnapshot(unittest.TestCase):
+    """Test the memory-mapped read-only vault snapshot."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_44_snapshot_lookups(self):
+        """Test name, ID, content and list queries against the snapshot."""
+        prompt_vault.add_prompt("Code-Review", "Review this ✓ code", category="coding",
+                                tags=["python"])
+        prompt_vault.add_prompt("essay", "Write an essay", category="writing")
+        vault = prompt_vault.load_vault()
+        essay_id = vault["prompts"][1]["id"]
+        
+        with prompt_vault.open_snapshot() as snap:
+            self.assertEqual(len(snap), 2)
+            self.assertEqual(snap.get("code-review")["content"], "Review this ✓ code")
+            self.assertEqual(snap.get(essay_id)["name"], "essay")
+            self.assertIsNone(snap.get("missing"))
+            self.assertEqual(snap.content(snap.find("ESSAY")), "Write an essay")
+            self.assertEqual(snap.names(), ["Code-Review", "essay"])
+            self.assertEqual([p["name"] for p in snap.list(tag="PYTHON")], ["Code-Review"])
+            self.assertNotIn("content", snap.list(category="writing")[0])
+    
+    def test_45_snapshot_generation(self):
+        """Test that writes bump the generation and mapped views can remap."""
+        prompt_vault.add_prompt("first", "Content")
+        snap = prompt_vault.open_snapshot()
+        try:
+            generation = snap.generation
+            self.assertFalse(snap.is_stale())
+            
+            prompt_vault.add_prompt("second", "Content")
+            self.assertTrue(snap.is_stale())
+            self.assertIsNone(snap.get("second"))
+            
+            self.assertTrue(snap.refresh())
+            self.assertEqual(snap.generation, generation + 1)
+            self.assertIsNotNone(snap.get("second"))
+            self.assertFalse(snap.refresh())
+        finally:
+            snap.close()
+    
+    def test_46_open_snapshot_builds_missing(self):
+        """Test that a missing snapshot is built and bad files are rejected."""
+        prompt_vault.add_prompt("p", "Content")
+        snap_file = self.vault_dir / prompt_vault.SNAPSHOT_FILENAME
+        snap_file.unlink()
+        with prompt_vault.open_snapshot() as snap:
+            self.assertEqual(snap.names(), ["p"])
+        
+        snap_file.write_bytes(b"not a snapshot" * 10)
+        with self.assertRaises(ValueError):
+            prompt_vault.VaultSnapshot(snap_file)
+
+
+
+class TestVaultWatcher(unittest.TestCase):
+    """Test incremental reload for long-running embedders."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _watcher(self):
+        """Create a watcher that counts full reloads."""
+        watcher = prompt_vault.VaultWatcher()
+        watcher.full_reloads = 0
+        reload = watcher.reload
+        
+        def counting_reload():
+            watcher.full_reloads += 1
+            reload()
+        watcher.reload = counting_reload
+        return watcher
+    
+    def test_47_incremental_patch(self):
+        """Test that adds, updates and deletes are patched in without a reload."""
+        prompt_vault.add_prompt("keep", "Content", category="coding")
+        prompt_vault.add_prompt("drop", "Content")
+        watcher = self._watcher()
+        self.assertFalse(watcher.poll())
+        
+        prompt_vault.add_prompt("new", "Fresh", category="coding")
+        prompt_vault.update_prompt("keep", new_content="Changed", new_name="kept")
+        prompt_vault.delete_prompt("drop")
+        
+        self.assertTrue(watcher.poll())
+        self.assertEqual(watcher.full_reloads, 0)
+        self.assertEqual(watcher.get("KEPT")["content"], "Changed")
+        self.assertIsNone(watcher.get("keep"))
+        self.assertIsNone(watcher.get("drop"))
+        self.assertEqual(watcher.get("new")["content"], "Fresh")
+        self.assertEqual(sorted(p["name"] for p in watcher.list(category="coding")), ["kept", "new"])
+        self.assertEqual(watcher.generation, prompt_vault.load_vault()["generation"])
+    
+    def test_48_hand_edit_triggers_full_reload(self):
+        """Test that edits bypassing the library fall back to a full reload."""
+        prompt_vault.add_prompt("orig", "Content")
+        watcher = self._watcher()
+        
+        vault = json.loads(self.vault_file.read_text())
+        vault["prompts"][0]["content"] = "Edited by hand, longer"
+        self.vault_file.write_text(json.dumps(vault))
+        
+        self.assertTrue(watcher.poll())
+        self.assertEqual(watcher.full_reloads, 1)
+        self.assertEqual(watcher.get("orig")["content"], "Edited by hand, longer")
+    
+    def test_49_journal_gap_triggers_full_reload(self):
+        """Test that a restarted journal forces a full reload."""
+        prompt_vault.add_prompt("a", "Content")
+        watcher = self._watcher()
+        prompt_vault.add_prompt("b", "Content")
+        (self.vault_dir / prompt_vault.JOURNAL_FILENAME).write_text("")
+        prompt_vault.add_prompt("c", "Content")
+        
+        self.assertTrue(watcher.poll())
+        self.assertEqual(watcher.full_reloads, 1)
+        self.assertEqual(len(watcher.list()), 3)
+    
+    def test_81_plain_save_vault_reloads_watcher(self):
+        """Test that editing a loaded vault and calling save_vault reaches a watcher."""
+        prompt_vault.add_prompt("p", "v1")
+        watcher = self._watcher()
+        
+        vault = prompt_vault.load_vault()
+        vault["prompts"][0]["content"] = "v2"
+        prompt_vault.save_vault(vault)
+        
+        self.assertTrue(watcher.poll())
+        self.assertEqual(watcher.full_reloads, 1)
+        self.assertEqual(watcher.get("p")["content"], "v2")
+        
+        # Library writes are still patched in incrementally afterwards
+        prompt_vault.update_prompt("p", new_content="v3")
+        self.assertTrue(watcher.poll())
+        self.assertEqual(watcher.full_reloads, 1)
+        self.assertEqual(watcher.get("p")["content"], "v3")
+
+
+
+class TestDirectoryImport(unittest.TestCase):
+    """Test importing trees of Markdown/text prompt files."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _write(self, relpath, text):
+        """Write a file under the import tree."""
+        path = Path(self.temp_dir) / "prompts" / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        return path
+    
+    def test_50_parse_front_matter(self):
+        """Test the front matter subset used by prompt files."""
+        meta, body = prompt_vault.parse_front_matter(
+            "---\nname: \"Code Review\"\ntags: [python, 'review']\n"
+            "aliases:\n  - cr\n  - review\n---\n\nReview [CODE]\n")
+        self.assertEqual(meta["name"], "Code Review")
+        self.assertEqual(meta["tags"], ["python", "review"])
+        self.assertEqual(meta["aliases"], ["cr", "review"])
+        self.assertEqual(body, "Review [CODE]\n")
+        
+        self.assertEqual(prompt_vault.parse_front_matter("plain text"), ({}, "plain text"))
+        with self.assertRaises(ValueError):
+            prompt_vault.parse_front_matter("---\nname: x\n")
+    
+    def test_51_import_directory(self):
+        """Test a directory import with a bad file and an existing prompt."""
+        prompt_vault.add_prompt("existing", "Original")
+        self._write("coding/review.md", "---\nname: review\ncategory: coding\ntags: a, b\n---\nReview it")
+        self._write("notes/essay.txt", "Write an essay")
+        self._write("existing.md", "Replacement")
+        self._write("broken.md", "---\nname: broken\n")
+        self._write(".hidden/skip.md", "Hidden")
+        self._write("image.png", "not a prompt")
+        
+        writes = []
+        hook = prompt_vault.add_trace_hook(
+            lambda kind, name, value: writes.append(name) if name == "save_vault.write" else None)
+        try:
+            summary = prompt_vault.import_directory(str(Path(self.temp_dir) / "prompts"), progress=False)
+        finally:
+            prompt_vault.remove_trace_hook(hook)
+        
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(summary["imported"], 2)
+        self.assertEqual(summary["skipped"], 1)
+        self.assertEqual(len(summary["errors"]), 1)
+        self.assertTrue(summary["errors"][0]["file"].endswith("broken.md"))
+        
+        review = prompt_vault.get_prompt("review")
+        self.assertEqual(review["category"], "coding")
+        self.assertEqual(review["tags"], ["a", "b"])
+        self.assertEqual(prompt_vault.get_prompt("essay")["content"], "Write an essay")
+        self.assertEqual(prompt_vault.get_prompt("existing")["content"], "Original")
+    
+    def test_52_parallel_import_with_overwrite(self):
+        """Test the process-pool path and overwriting existing prompts."""
+        prompt_vault.add_prompt("p0", "Old")
+        for i in range(20):
+            self._write(f"p{i}.md", f"Prompt {i}")
+        
+        old_threshold = prompt_vault.PARALLEL_IMPORT_THRESHOLD
+        prompt_vault.PARALLEL_IMPORT_THRESHOLD = 5
+        try:
+            summary = prompt_vault.import_directory(str(Path(self.temp_dir) / "prompts"),
+                                                    overwrite=True, workers=2, progress=False)
+        finally:
+            prompt_vault.PARALLEL_IMPORT_THRESHOLD = old_threshold
+        
+        self.assertEqual((summary["imported"], summary["updated"]), (19, 1))
+        self.assertEqual(len(prompt_vault.load_vault()["prompts"]), 20)
+        self.assertEqual(prompt_vault.get_prompt("p0")["content"], "Prompt 0")
+        self.assertEqual(prompt_vault.get_revision("p0", 1), "Old")
+    
+    def test_70_worker_count_validated(self):
+        """Test that a worker count below 1 is rejected up front."""
+        import argparse
+        with self.assertRaises(argparse.ArgumentTypeError):
+            prompt_vault.parse_workers("0")
+        self.assertEqual(prompt_vault.parse_workers("3"), 3)
+        with self.assertRaises(ValueError):
+            prompt_vault.import_directory(self.temp_dir, workers=0, progress=False)
+
+
+
+class TestColdArchive(unittest.TestCase):
+    """Test moving unused prompts to the cold archive."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _add_old(self, name, content, days_ago):
+        """Add a prompt last edited `days_ago` days ago."""
+        prompt_vault.add_prompt(name, content)
+        vault = prompt_vault.load_vault()
+        stamp = datetime.fromtimestamp(datetime.now().timestamp() - days_ago * 86400).isoformat()
+        vault["prompts"][-1]["updated"] = stamp
+        prompt_vault.save_vault(vault)
+    
+    def test_53_archive_cold_prompts(self):
+        """Test that cold prompts leave the vault but stay reachable."""
+        self._add_old("ancient", "Old unicorn content", 400)
+        self._add_old("fresh", "New content", 1)
+        
+        archived = prompt_vault.archive_prompts(180)
+        self.assertEqual(archived, ["ancient"])
+        vault = prompt_vault.load_vault()
+        self.assertEqual([p["name"] for p in vault["prompts"]], ["fresh"])
+        
+        prompt = prompt_vault.get_prompt("ancient")
+        self.assertTrue(prompt["archived"])
+        self.assertEqual(prompt["content"], "Old unicorn content")
+        self.assertEqual(prompt_vault.list_prompts(search="unicorn"), [])
+        self.assertEqual(len(prompt_vault.list_prompts(search="unicorn", include_archived=True)), 1)
+        self.assertFalse(prompt_vault.add_prompt("ANCIENT", "Duplicate"))
+    
+    def test_54_use_promotes_archived(self):
+        """Test that using an archived prompt moves it back to the hot vault."""
+        self._add_old("sleepy", "Zzz", 365)
+        prompt_vault.archive_prompts(30)
+        
+        content = prompt_vault.use_prompt("sleepy", copy_to_clipboard=False)
+        self.assertEqual(content, "Zzz")
+        vault = prompt_vault.load_vault()
+        self.assertEqual([p["name"] for p in vault["prompts"]], ["sleepy"])
+        self.assertEqual(vault["prompts"][0]["uses"], 1)
+        self.assertIsNone(prompt_vault.find_archived("sleepy"))
+        
+        # Recently used prompts are not archived again
+        self.assertEqual(prompt_vault.archive_prompts(30), [])
+    
+    def test_55_archive_compaction_and_delete(self):
+        """Test deleting archived prompts and compacting the segment."""
+        for i in range(3):
+            self._add_old(f"cold{i}", f"Content {i}", 300)
+        prompt_vault.archive_prompts(100)
+        segment = self.vault_dir / prompt_vault.ARCHIVE_SEGMENT
+        size = segment.stat().st_size
+        
+        old_min = prompt_vault.ARCHIVE_COMPACT_MIN_BYTES
+        prompt_vault.ARCHIVE_COMPACT_MIN_BYTES = 0
+        try:
+            self.assertTrue(prompt_vault.delete_prompt("cold0"))
+            self.assertTrue(prompt_vault.update_prompt("cold1", new_category="coding"))
+        finally:
+            prompt_vault.ARCHIVE_COMPACT_MIN_BYTES = old_min
+        self.assertIsNone(prompt_vault.get_prompt("cold0"))
+        self.assertEqual(prompt_vault.get_archived("cold2")["content"], "Content 2")
+        
+        # Two of three records are dead, so the segment was compacted
+        self.assertLess(segment.stat().st_size, size)
+        self.assertEqual(prompt_vault.load_archived()[0]["name"], "cold2")
+    
+    def test_71_promote_in_session_persists_first(self):
+        """Test that promoting inside a batch session writes the hot copy before dropping the archive entry."""
+        self._add_old("sleepy", "Zzz", 365)
+        prompt_vault.archive_prompts(30)
+        
+        with prompt_vault.vault_session():
+            prompt_vault.use_prompt("sleepy", copy_to_clipboard=False)
+            on_disk = json.loads(self.vault_file.read_text())["prompts"]
+            self.assertEqual([p["name"] for p in on_disk], ["sleepy"])
+            self.assertIsNone(prompt_vault.find_archived("sleepy"))
+    
+    def test_72_import_dir_updates_archived(self):
+        """Test that import-dir never creates a hot duplicate of an archived prompt."""
+        self._add_old("old", "Archived text", 365)
+        prompt_vault.archive_prompts(30)
+        prompts_dir = Path(self.temp_dir) / "prompts"
+        prompts_dir.mkdir()
+        (prompts_dir / "old.md").write_text("New text")
+        
+        summary = prompt_vault.import_directory(str(prompts_dir), progress=False)
+        self.assertEqual(summary["skipped"], 1)
+        self.assertEqual(prompt_vault.load_vault()["prompts"], [])
+        
+        summary = prompt_vault.import_directory(str(prompts_dir), overwrite=True, progress=False)
+        self.assertEqual(summary["updated"], 1)
+        self.assertEqual([p["name"] for p in prompt_vault.load_vault()["prompts"]], ["old"])
+        self.assertEqual(prompt_vault.get_prompt("old")["content"], "New text")
+        self.assertIsNone(prompt_vault.find_archived("old"))
+
+
+
+class TestCompactRecords(unittest.TestCase):
+    """Test slotted Prompt records behind load_vault."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+        self.old_compact = prompt_vault.COMPACT_RECORDS
+        prompt_vault.COMPACT_RECORDS = True
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        prompt_vault.COMPACT_RECORDS = self.old_compact
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_56_prompt_round_trip(self):
+        """Test that a Prompt behaves like and converts back to its dict."""
+        data = {
+            "id": "abc12345", "name": "p", "content": "c", "category": "coding",
+            "tags": ["a", "b"], "description": "d",
+            "created": "2024-05-01T10:20:30.123456", "updated": "2024-05-01T10:20:30+00:00",
+            "uses": 7, "custom": {"x": 1}
+        }
+        prompt = prompt_vault.Prompt.from_dict(data, prompt_vault.PromptColumns())
+        self.assertEqual(prompt.to_dict(), data)
+        self.assertEqual(prompt["tags"], ["a", "b"])
+        self.assertEqual(prompt.get("missing", 1), 1)
+        self.assertIn("custom", prompt)
+        
+        prompt["uses"] += 1
+        prompt["updated"] = "2025-01-01T00:00:00"
+        self.assertEqual(prompt["uses"], 8)
+        self.assertEqual(prompt["updated"], "2025-01-01T00:00:00")
+        with self.assertRaises(KeyError):
+            prompt["nope"]
+    
+    def test_57_compact_vault_operations(self):
+        """Test that the regular API works and saves plain JSON with compact records."""
+        prompt_vault.add_prompt("one", "First", category="coding", tags=["python"])
+        prompt_vault.add_prompt("two", "Second", category="coding", tags=["python"])
+        prompt_vault.update_prompt("one", new_content="First v2")
+        prompt_vault.use_prompt("two", copy_to_clipboard=False)
+        
+        vault = prompt_vault.load_vault()
+        self.assertIsInstance(vault["prompts"][0], prompt_vault.Prompt)
+        self.assertEqual(len(prompt_vault.list_prompts(category="coding", tag="PYTHON")), 2)
+        self.assertEqual(prompt_vault.get_prompt("two")["uses"], 1)
+        
+        saved = json.loads(self.vault_file.read_text())
+        self.assertEqual(saved["prompts"][0]["content"], "First v2")
+        self.assertEqual(saved["prompts"][1]["tags"], ["python"])
+    
+    def test_58_interning_and_columns(self):
+        """Test that repeated strings are shared and numbers live in arrays."""
+        for i in range(3):
+            prompt_vault.add_prompt(f"p{i}", f"Content {i}", category="".join(["cod", "ing"]),
+                                    tags=["".join(["py", "thon"])])
+        prompts = prompt_vault.load_vault()["prompts"]
+        self.assertIs(prompts[0].category, prompts[2].category)
+        self.assertIs(prompts[0].tags[0], prompts[1].tags[0])
+        self.assertIs(prompts[0]._columns, prompts[2]._columns)
+        self.assertEqual(len(prompts[0]._columns.uses), 3)
+        self.assertFalse(hasattr(prompts[0], "__dict__"))
+    
+    def test_76_size_lives_in_columns(self):
+        """Test that size metadata is packed into the columns, not a per-record dict."""
+        prompt_vault.add_prompt("p", "Some content here")
+        prompt = prompt_vault.load_vault()["prompts"][0]
+        self.assertIsNone(prompt._extra)
+        self.assertEqual(prompt["size"], prompt_vault.prompt_size("Some content here"))
+        self.assertIn("size", prompt)
+        
+        prompt["size"] = {"chars": "odd"}
+        self.assertEqual(prompt["size"], {"chars": "odd"})
+        prompt["size"] = prompt_vault.prompt_size("x")
+        self.assertFalse(prompt._extra)
+        self.assertEqual(prompt.to_dict()["size"]["chars"], 1)
+        
+        bare = prompt_vault.Prompt.from_dict({"id": "i", "name": "n", "content": "c"},
+                                             prompt_vault.PromptColumns())
+        self.assertNotIn("size", bare)
+        self.assertIsNone(bare.get("size"))
+    
+    def test_82_missing_timestamps_stay_missing(self):
+        """Test that records without created/updated round-trip without invented dates."""
+        data = {"id": "i", "name": "n", "content": "c", "category": "general", "tags": [],
+                "description": "", "uses": 0}
+        prompt = prompt_vault.Prompt.from_dict(data, prompt_vault.PromptColumns())
+        self.assertNotIn("created", prompt)
+        self.assertIsNone(prompt.get("updated"))
+        self.assertEqual(prompt.to_dict(), data)
+        
+        self.vault_file.write_text(json.dumps({"prompts": [data], "version": "1.0.0"}))
+        prompt_vault.save_vault(prompt_vault.load_vault())
+        saved = json.loads(self.vault_file.read_text())["prompts"][0]
+        self.assertNotIn("created", saved)
+        self.assertEqual(prompt_vault.archive_prompts(30), [])
+
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test the generation-keyed query result cache."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+        self.old_enabled = prompt_vault.QUERY_CACHE_ENABLED
+        prompt_vault.QUERY_CACHE_ENABLED = True
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        prompt_vault.QUERY_CACHE_ENABLED = self.old_enabled
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _phases(self, func, *args, **kwargs):
+        """Run func and return (result, set of traced phase names)."""
+        phases = set()
+        hook = prompt_vault.add_trace_hook(
+            lambda kind, name, value: phases.add(name) if kind == "phase" else None)
+        try:
+            return func(*args, **kwargs), phases
+        finally:
+            prompt_vault.remove_trace_hook(hook)
+    
+    def test_59_repeat_query_skips_vault_load(self):
+        """Test that a repeated query is answered without reading the vault."""
+        prompt_vault.add_prompt("py", "Python help", category="coding", tags=["python"])
+        prompt_vault.add_prompt("js", "JS help", category="coding", tags=["js"])
+        
+        first, phases = self._phases(prompt_vault.list_prompts, category="coding", tag="python")
+        self.assertIn("load_vault.read", phases)
+        second, phases = self._phases(prompt_vault.list_prompts, category="CODING", tag="Python")
+        self.assertNotIn("load_vault.read", phases)
+        self.assertEqual([dict(p) for p in first], second)
+        
+        stats = prompt_vault.get_query_cache().stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+    
+    def test_60_mutations_invalidate(self):
+        """Test that writes and uses change the generation and miss the cache."""
+        prompt_vault.add_prompt("a", "Content")
+        self.assertEqual(len(prompt_vault.list_prompts()), 1)
+        
+        prompt_vault.add_prompt("b", "Content")
+        self.assertEqual(len(prompt_vault.list_prompts()), 2)
+        
+        prompt_vault.use_prompt("a", copy_to_clipboard=False)
+        uses = {p["name"]: p["uses"] for p in prompt_vault.list_prompts()}
+        self.assertEqual(uses["a"], 1)
+        self.assertEqual(prompt_vault.get_query_cache().stats()["hits"], 0)
+    
+    def test_61_bounds_and_persistence(self):
+        """Test LRU eviction by count and bytes, and reuse from disk."""
+        prompt_vault.add_prompt("a", "x" * 100)
+        old = prompt_vault.QUERY_CACHE_MAX_ENTRIES, prompt_vault.QUERY_CACHE_MAX_BYTES
+        prompt_vault.QUERY_CACHE_MAX_ENTRIES, prompt_vault.QUERY_CACHE_MAX_BYTES = 2, 10_000
+        try:
+            cache = prompt_vault.get_query_cache()
+            cache.put("k1", [1])
+            cache.put("k2", [2])
+            self.assertEqual(cache.get("k1"), [1])
+            cache.put("k3", [3])
+            self.assertIsNone(cache.get("k2"))
+            cache.put("big", ["y" * 20_000])
+            self.assertIsNone(cache.get("big"))
+            
+            reloaded = prompt_vault.QueryCache(cache.path)
+            self.assertEqual(reloaded.get("k3"), [3])
+            self.assertEqual(reloaded.get("k1"), [1])
+        finally:
+            prompt_vault.QUERY_CACHE_MAX_ENTRIES, prompt_vault.QUERY_CACHE_MAX_BYTES = old
+    
+    def test_73_hits_do_not_rewrite_entries(self):
+        """Test that a cache hit only persists the counters, not the entries."""
+        prompt_vault.add_prompt("a", "Content")
+        prompt_vault.list_prompts()
+        cache_file = self.vault_dir / prompt_vault.QUERY_CACHE_FILENAME
+        before = cache_file.stat().st_ino, cache_file.read_bytes()
+        
+        prompt_vault.list_prompts()
+        prompt_vault.list_prompts()
+        self.assertEqual((cache_file.stat().st_ino, cache_file.read_bytes()), before)
+        
+        stats = prompt_vault.QueryCache(cache_file).stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+    
+    def test_74_estimator_change_misses(self):
+        """Test that switching the token estimator does not serve cached max_tokens results."""
+        prompt_vault.add_prompt("a", "one two three four five six seven eight")
+        self.assertEqual(len(prompt_vault.list_prompts(max_tokens=5)), 0)
+        
+        prompt_vault.register_token_estimator("tiny", lambda text: 1, default=True)
+        try:
+            self.assertEqual(len(prompt_vault.list_prompts(max_tokens=5)), 1)
+        finally:
+            prompt_vault.TOKEN_ESTIMATORS.pop("tiny", None)
+            prompt_vault.TOKEN_ESTIMATOR = "heuristic"
+    
+    def test_83_concurrent_write_is_not_cached(self):
+        """Test that a result read before a concurrent write is not stored under the new generation."""
+        prompt_vault.add_prompt("p", "one")
+        original = prompt_vault._filter_prompts
+        
+        def filter_then_concurrent_write(*args):
+            result = original(*args)
+            prompt_vault._filter_prompts = original
+            prompt_vault.update_prompt("p", new_content="two")
+            return result
+        
+        prompt_vault._filter_prompts = filter_then_concurrent_write
+        try:
+            self.assertEqual(prompt_vault.list_prompts()[0]["content"], "one")
+        finally:
+            prompt_vault._filter_prompts = original
+        self.assertEqual(prompt_vault.list_prompts()[0]["content"], "two")
+        self.assertEqual(prompt_vault.list_prompts()[0]["content"], "two")
+
+
+
+class TestPromptPacks(unittest.TestCase):
+    """Test read-only prompt packs layered under the vault."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _install(self, prompts, name="team"):
+        """Write a pack file and install it."""
+        pack_file = Path(self.temp_dir) / f"{name}.json"
+        pack_file.write_text(json.dumps({"prompts": prompts}))
+        self.assertTrue(prompt_vault.install_pack(str(pack_file)))
+    
+    def test_62_pack_prompts_are_merged(self):
+        """Test get/use/list/search over packs without copying into the vault."""
+        prompt_vault.add_prompt("mine", "My prompt", category="writing")
+        self._install([
+            {"name": "review", "content": "Review [CODE]", "category": "coding", "tags": ["qa"]},
+            {"name": "tests", "content": "Write tests", "category": "testing"},
+        ])
+        
+        self.assertEqual(prompt_vault.get_prompt("REVIEW")["pack"], "team")
+        self.assertEqual(prompt_vault.use_prompt("review", copy_to_clipboard=False), "Review [CODE]")
+        self.assertEqual(prompt_vault.get_prompt("review")["uses"], 1)
+        self.assertEqual(len(prompt_vault.load_vault()["prompts"]), 1)
+        
+        self.assertEqual(sorted(p["name"] for p in prompt_vault.list_prompts()),
+                         ["mine", "review", "tests"])
+        self.assertEqual([p["name"] for p in prompt_vault.list_prompts(tag="qa")], ["review"])
+        self.assertEqual([p["name"] for p in prompt_vault.list_prompts(search="write")], ["tests"])
+        self.assertFalse(prompt_vault.add_prompt("tests", "Duplicate"))
+    
+    def test_63_copy_on_write_overrides(self):
+        """Test that edits copy the pack prompt and deletes only drop the copy."""
+        self._install([{"name": "review", "content": "Pack version"}])
+        
+        self.assertTrue(prompt_vault.update_prompt("review", new_content="My version"))
+        self.assertEqual(prompt_vault.get_prompt("review")["content"], "My version")
+        self.assertEqual(len(prompt_vault.list_prompts()), 1)
+        self.assertEqual(prompt_vault.get_revision("review", 1), "Pack version")
+        
+        self.assertTrue(prompt_vault.delete_prompt("review"))
+        self.assertEqual(prompt_vault.get_prompt("review")["content"], "Pack version")
+        self.assertFalse(prompt_vault.delete_prompt("review"))
+    
+    def test_64_reinstall_and_remove(self):
+        """Test that reinstalling updates a pack in place and removal hides it."""
+        self._install([{"name": "review", "content": "v1"}])
+        first_id = prompt_vault.get_prompt("review")["id"]
+        self._install([{"name": "review", "content": "v2"}, {"name": "new", "content": "n"}])
+        
+        self.assertEqual(prompt_vault.get_prompt("review")["content"], "v2")
+        self.assertEqual(prompt_vault.get_prompt("review")["id"], first_id)
+        self.assertEqual(prompt_vault.list_packs(), [("team", 2)])
+        names = (self.vault_dir / prompt_vault.NAMES_FILENAME).read_text().split()
+        self.assertEqual(names, ["new", "review"])
+        
+        self.assertTrue(prompt_vault.remove_pack("team"))
+        self.assertIsNone(prompt_vault.get_prompt("review"))
+        self.assertEqual(prompt_vault.list_prompts(), [])
+    
+    def test_75_listing_packs_skips_bodies(self):
+        """Test that pack bodies are decoded only for returned records and searches."""
+        self._install([{"name": f"k{i}", "content": f"Body {i}"} for i in range(3)])
+        reads = []
+        original = prompt_vault.VaultSnapshot.content
+        prompt_vault.VaultSnapshot.content = lambda snap, i: reads.append(i) or original(snap, i)
+        try:
+            self.assertEqual(prompt_vault.list_prompts(category="coding"), [])
+            self.assertEqual(len(prompt_vault.select_prompts(max_tokens=100)), 3)
+            self.assertEqual(reads, [])
+            
+            listed = prompt_vault.list_prompts(category="general", max_tokens=100)
+            self.assertEqual(sorted(p["content"] for p in listed), ["Body 0", "Body 1", "Body 2"])
+            self.assertEqual(len(reads), 3)
+            
+            self.assertEqual([p["name"] for p in prompt_vault.list_prompts(search="body 1")], ["k1"])
+            self.assertEqual(prompt_vault.get_prompt("k2")["content"], "Body 2")
+        finally:
+            prompt_vault.VaultSnapshot.content = original
+        
+        export_file = Path(self.temp_dir) / "export.json"
+        prompt_vault.export_prompts(str(export_file))
+        exported = json.loads(export_file.read_text())["prompts"]
+        self.assertEqual(sorted(p["content"] for p in exported), ["Body 0", "Body 1", "Body 2"])
+    
+    def test_84_import_dir_respects_packs(self):
+        """Test that import-dir skips pack prompts, or overrides them copy-on-write."""
+        self._install([{"name": "review", "content": "Pack version"}])
+        pack_id = prompt_vault.get_prompt("review")["id"]
+        prompts_dir = Path(self.temp_dir) / "prompts"
+        prompts_dir.mkdir()
+        (prompts_dir / "review.md").write_text("File version")
+        
+        summary = prompt_vault.import_directory(str(prompts_dir), progress=False)
+        self.assertEqual((summary["imported"], summary["skipped"]), (0, 1))
+        self.assertEqual(prompt_vault.get_prompt("review")["content"], "Pack version")
+        
+        summary = prompt_vault.import_directory(str(prompts_dir), overwrite=True, progress=False)
+        self.assertEqual(summary["updated"], 1)
+        copy = prompt_vault.load_vault()["prompts"]
+        self.assertEqual([(p["id"], p["pack"], p["content"]) for p in copy],
+                         [(pack_id, "team", "File version")])
+        self.assertEqual(prompt_vault.get_revision("review", 1), "Pack version")
+        
+        prompt_vault.delete_prompt("review")
+        self.assertEqual(prompt_vault.get_prompt("review")["content"], "Pack version")
+
+
+class TestTokenBudget(unittest.TestCase):
+    """Test precomputed size metadata and budget-aware selection."""
+    
+    def setUp(self):
+        """Create a temporary vault for testing."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.vault_dir = Path(self.temp_dir) / ".prompt-vault"
+        self.vault_file = self.vault_dir / "prompts.json"
+        self.config_file = self.vault_dir / "config.json"
+        
+        # Override vault paths
+        prompt_vault.VAULT_DIR = self.vault_dir
+        prompt_vault.VAULT_FILE = self.vault_file
+        prompt_vault.CONFIG_FILE = self.config_file
+        
+        # Initialize vault
+        prompt_vault.init_vault()
+    
+    def tearDown(self):
+        """Clean up temporary vault."""
+        prompt_vault.TOKEN_ESTIMATORS.pop("words", None)
+        prompt_vault.TOKEN_ESTIMATOR = "heuristic"
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_65_size_metadata_on_write(self):
+        """Test that size metadata is stored on add/update and used by list."""
+        prompt_vault.add_prompt("short", "Fix this bug")
+        prompt_vault.add_prompt("long", "word " * 300)
+        
+        size = prompt_vault.get_prompt("short")["size"]
+        self.assertEqual((size["chars"], size["words"], size["estimator"]), (12, 3, "heuristic"))
+        self.assertEqual(size["tokens"], 4)
+        
+        prompt_vault.update_prompt("short", new_content="Fix this bug in [LANGUAGE] please")
+        self.assertEqual(prompt_vault.get_prompt("short")["size"]["words"], 6)
+        
+        self.assertEqual([p["name"] for p in prompt_vault.list_prompts(max_tokens=50)], ["short"])
+        self.assertEqual(len(prompt_vault.list_prompts(max_tokens=1000)), 2)
+    
+    def test_66_select_backfills_without_reading_content(self):
+        """Test lazy backfill of old vaults and selection from metadata only."""
+        vault = {"prompts": [
+            {"id": f"id{i}", "name": f"p{i}", "content": "x " * (10 * (i + 1)),
+             "category": "coding", "tags": [], "description": "",
+             "created": "2024-01-01T00:00:00", "updated": "2024-01-01T00:00:00", "uses": 0}
+            for i in range(3)
+        ], "version": "1.0.0"}
+        self.vault_file.write_text(json.dumps(vault))
+        
+        chosen = prompt_vault.select_prompts(max_tokens=20)
+        self.assertEqual([p["name"] for p in chosen], ["p0"])
+        self.assertNotIn("content", chosen[0])
+        self.assertIn("size", json.loads(self.vault_file.read_text())["prompts"][0])
+        
+        original = prompt_vault.VaultSnapshot.content
+        prompt_vault.VaultSnapshot.content = lambda snap, i: self.fail("content was read")
+        try:
+            self.assertEqual(len(prompt_vault.select_prompts()), 3)
+        finally:
+            prompt_vault.VaultSnapshot.content = original
+    
+    def test_67_budget_and_custom_estimator(self):
+        """Test greedy budget filling by uses and a registered estimator."""
+        prompt_vault.add_prompt("a", "one two three four five six")
+        prompt_vault.add_prompt("b", "one two three")
+        prompt_vault.add_prompt("c", "one two")
+        prompt_vault.use_prompt("a", copy_to_clipboard=False)
+        prompt_vault.use_prompt("c", copy_to_clipboard=False)
+        prompt_vault.use_prompt("c", copy_to_clipboard=False)
+        
+        prompt_vault.register_token_estimator("words", lambda text: len(text.split()), default=True)
+        chosen = prompt_vault.select_prompts(budget=8)
+        self.assertEqual([p["name"] for p in chosen], ["c", "a"])
+        self.assertEqual(sum(p["size"]["tokens"] for p in chosen), 8)
+        self.assertEqual(prompt_vault.load_vault()["prompts"][0]["size"]["estimator"], "words")
+    
+    def test_77_select_hides_renamed_pack_copies(self):
+        """Test that a renamed copy-on-write edit hides its pack original, as in list."""
+        pack_file = Path(self.temp_dir) / "team.json"
+        pack_file.write_text(json.dumps({"prompts": [{"name": "k0", "content": "Pack body"}]}))
+        prompt_vault.install_pack(str(pack_file))
+        prompt_vault.update_prompt("k0", new_name="mine")
+        
+        self.assertEqual([p["name"] for p in prompt_vault.list_prompts()], ["mine"])
+        self.assertEqual([p["name"] for p in prompt_vault.select_prompts()], ["mine"])
+    
+    def test_78_backfill_reaches_watchers(self):
+        """Test that backfilled sizes are journaled so a watcher patches them in."""
+        prompt_vault.add_prompt("p", "one two three")
+        watcher = prompt_vault.VaultWatcher()
+        
+        prompt_vault.register_token_estimator("words", lambda text: len(text.split()), default=True)
+        prompt_vault.save_vault(prompt_vault.load_vault())
+        self.assertTrue(watcher.poll())
+        self.assertEqual(watcher.get("p")["size"]["estimator"], "words")
+        self.assertEqual(watcher.get("p")["size"]["tokens"], 3)
+
+
 def run_tests():
     """Run all tests and return results."""
     loader = unittest.TestLoader()
@@ -382,6 +1654,19 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestVaultOperations))
     suite.addTests(loader.loadTestsFromTestCase(TestImportExport))
     suite.addTests(loader.loadTestsFromTestCase(TestUtilityFunctions))
+    suite.addTests(loader.loadTestsFromTestCase(TestRevisionHistory))
+    suite.addTests(loader.loadTestsFromTestCase(TestUsageAnalytics))
+    suite.addTests(loader.loadTestsFromTestCase(TestTracing))
+    suite.addTests(loader.loadTestsFromTestCase(TestShellCompletion))
+    suite.addTests(loader.loadTestsFromTestCase(TestBatchMode))
+    suite.addTests(loader.loadTestsFromTestCase(TestSharedSnapshot))
+    suite.addTests(loader.loadTestsFromTestCase(TestVaultWatcher))
+    suite.addTests(loader.loadTestsFromTestCase(TestDirectoryImport))
+    suite.addTests(loader.loadTestsFromTestCase(TestColdArchive))
+    suite.addTests(loader.loadTestsFromTestCase(TestCompactRecords))
+    suite.addTests(loader.loadTestsFromTestCase(TestQueryCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestPromptPacks))
+    suite.addTests(loader.loadTestsFromTestCase(TestTokenBudget))
     
     # Run with verbose output
     runner = unittest.TextTestRunner(verbosity=2)